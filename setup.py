@@ -37,14 +37,12 @@ OPTIONS = {
         "NSHighResolutionCapable": True,
         "NSRequiresAquaSystemAppearance": False,  # Support dark mode
     },
+    # Only packages that ship non-Python data (nicegui's static assets,
+    # pywebview's JS bridge) need to be copied whole; everything else is
+    # pulled in module by module via the dependency graph
     "packages": [
         "nicegui",
-        "pywebview",
-        "uvicorn",
-        "fastapi",
-        "starlette",
-        "objc",
-        "Foundation",
+        "webview",
         "src",
     ],
     "includes": [
@@ -53,12 +51,37 @@ OPTIONS = {
         "src.ui",
         "src.ui.alert_window",
         "src.monitors",
-        "src.monitors.notification_monitor",
+        "src.monitors.log_stream_monitor",
         "src.audio",
         "src.audio.sound_player",
-        "webview",
+        "src.webhook",
+        "src.webhook.sender",
+        # uvicorn picks these implementations at runtime by name
+        "uvicorn.logging",
+        "uvicorn.loops.auto",
+        "uvicorn.loops.uvloop",
+        "uvloop",
+        "uvicorn.protocols.http.auto",
+        "uvicorn.protocols.websockets.auto",
+        "uvicorn.lifespan.on",
+        "objc",
+        "Foundation",
+        "AVFoundation",
+    ],
+    "excludes": [
+        "tkinter",
+        "matplotlib",
+        "scipy",
+        "numpy",
+        "pandas",
+        "PyQt5",
+        "PyQt6",
+        "PySide2",
+        "PySide6",
+        "IPython",
     ],
-    "excludes": ["tkinter", "matplotlib", "scipy", "numpy", "pandas"],
+    "optimize": 1,  # Strip asserts; keep docstrings, some libraries read them
+    "strip": True,
     "resources": ["src", "resources"],
 }
 
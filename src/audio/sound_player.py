@@ -1,16 +1,94 @@
 """Sound player for Teams notifications using macOS system sounds."""
 
+import ctypes
+import functools
 import logging
-import subprocess
+import os
+import queue
+import shutil
+import sys
 import threading
+import time
 from pathlib import Path
+from typing import Any
 
 from ..config import config
 
+try:
+    from AVFoundation import AVAudioPlayer
+    from Foundation import NSURL
+except ImportError:
+    # Not on macOS or pyobjc AVFoundation bindings missing - use afplay instead
+    AVAudioPlayer = None
+    NSURL = None
+
+try:
+    from AppKit import NSBeep
+except ImportError:
+    NSBeep = None
+
 logger = logging.getLogger(__name__)
 
-# Get project root directory (for resolving relative paths)
-PROJECT_ROOT = Path(__file__).parent.parent.parent
+# Get project root directory (for resolving relative paths). Inside a py2app
+# bundle, resources live in Contents/Resources, which py2app exports as
+# RESOURCEPATH.
+PROJECT_ROOT = Path(
+    os.environ.get("RESOURCEPATH") or Path(__file__).parent.parent.parent
+)
+
+# Number of preloaded players per sound, so overlapping notifications don't cut
+# each other off (a single AVAudioPlayer restarts if play() is called again)
+PLAYER_POOL_SIZE = 3
+
+# Maximum afplay requests waiting for the fallback worker; more are dropped
+# rather than blocking the caller
+AFPLAY_QUEUE_SIZE = 8
+
+# afplay binary, resolved once so no PATH search happens per sound
+# (None when afplay is not installed, e.g. outside macOS)
+AFPLAY_PATH = shutil.which("afplay")
+
+# Redirect afplay's stdout/stderr to /dev/null inside the child
+_AFPLAY_FILE_ACTIONS = [
+    (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+    (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+]
+
+# Maximum afplay processes playing at once; further sounds are dropped
+MAX_AFPLAY_PROCESSES = 4
+
+# Repeats of the same sound within this window are coalesced into one
+SOUND_COALESCE_SECONDS = 0.1
+
+# QOS_CLASS_USER_INTERACTIVE from <sys/qos.h>
+QOS_CLASS_USER_INTERACTIVE = 0x21
+
+
+def _set_thread_qos_user_interactive() -> None:
+    """Raise the calling thread to user-interactive QoS on macOS.
+
+    Keeps the scheduler from deprioritizing sound playback when the
+    machine is busy. Does nothing on other platforms.
+    """
+    if sys.platform != "darwin":
+        return
+    try:
+        libsystem = ctypes.CDLL("/usr/lib/libSystem.dylib")
+        result = libsystem.pthread_set_qos_class_self_np(QOS_CLASS_USER_INTERACTIVE, 0)
+        if result != 0:
+            logger.debug(f"pthread_set_qos_class_self_np failed: {result}")
+    except (OSError, AttributeError) as e:
+        logger.debug(f"Could not set audio thread QoS: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def _list_system_sounds() -> tuple[str, ...]:
+    """List the macOS system sounds (the directory doesn't change at runtime)."""
+    try:
+        with os.scandir("/System/Library/Sounds") as entries:
+            return tuple(sorted(e.path for e in entries if e.name.endswith(".aiff")))
+    except OSError:
+        return ()
 
 
 class SoundPlayer:
@@ -18,7 +96,44 @@ class SoundPlayer:
 
     def __init__(self):
         self._enabled = config.sound_enabled
-        self._lock = threading.Lock()
+
+        # Absolute paths and existence of the configured sounds, which don't
+        # change at runtime, so playing a sound needs no filesystem access
+        self._resolved: dict[str, str] = {
+            sound_path: self._resolve_sound_path(sound_path)
+            for sound_path in (
+                config.chat_sound,
+                config.urgent_sound,
+                config.muted_sound,
+                config.unmuted_sound,
+            )
+        }
+        self._exists: dict[str, bool] = {
+            sound_path: os.path.exists(path)
+            for sound_path, path in self._resolved.items()
+        }
+
+        # Preloaded in-process players keyed by configured sound path, used
+        # round-robin so back-to-back sounds can overlap
+        self._pool: dict[str, list[Any]] = {}
+        self._pool_index: dict[str, int] = {}
+        self._preload_sounds()
+
+        # Monotonic time each sound was last played, for coalescing repeats
+        self._last_played: dict[str, float] = {}
+
+        # Single long-lived worker that runs afplay for sounds not preloaded,
+        # started on the first afplay fallback and stopped by close(). It is
+        # the only thread touching _afplay_pids, so no lock is needed.
+        self._afplay_pids: list[int] = []
+        self._afplay_queue: queue.Queue[str | None] = queue.Queue(
+            maxsize=AFPLAY_QUEUE_SIZE
+        )
+        self._afplay_worker: threading.Thread | None = None
+        self._afplay_worker_lock = threading.Lock()
+
+        if AFPLAY_PATH is None and len(self._pool) < len(self._resolved):
+            logger.warning("afplay not found, sounds will fall back to a system beep")
 
     @property
     def enabled(self) -> bool:
@@ -46,16 +161,43 @@ class SoundPlayer:
         """Play sound when unmuting."""
         self._play_sound_always(config.unmuted_sound)
 
-    def _resolve_sound_path(self, sound_path: str) -> Path:
-        """Resolve sound path, handling both absolute and relative paths."""
+    def _resolve_sound_path(self, sound_path: str) -> str:
+        """Resolve sound path to an absolute path, relative to the project root."""
         path = Path(sound_path)
-        if path.is_absolute():
-            return path
-        # Resolve relative to project root
-        return PROJECT_ROOT / path
+        if not path.is_absolute():
+            path = PROJECT_ROOT / path
+        return str(path)
+
+    def _preload_sounds(self) -> None:
+        """Load the configured sounds into AVAudioPlayer instances.
+
+        Decoding the WAV files and opening the audio device once up front means
+        playing a notification is just a call to play(), without spawning afplay.
+        """
+        if AVAudioPlayer is None:
+            logger.debug("AVFoundation not available, using afplay for sounds")
+            return
+
+        for sound_path, resolved_path in self._resolved.items():
+            if not self._exists[sound_path]:
+                continue
+            url = NSURL.fileURLWithPath_(resolved_path)
+            players = []
+            for _ in range(PLAYER_POOL_SIZE):
+                player, error = AVAudioPlayer.alloc().initWithContentsOfURL_error_(
+                    url, None
+                )
+                if player is None:
+                    logger.warning(f"Failed to load sound {resolved_path}: {error}")
+                    break
+                player.prepareToPlay()
+                players.append(player)
+            if players:
+                self._pool[sound_path] = players
+                self._pool_index[sound_path] = 0
 
     def _play_sound(self, sound_path: str) -> None:
-        """Play a sound file using macOS afplay command.
+        """Play a sound file using the preloaded player or macOS afplay command.
 
         Sound will not play if:
         - Sound is globally disabled (config.sound_enabled is False)
@@ -71,56 +213,155 @@ class SoundPlayer:
 
     def _play_sound_always(self, sound_path: str) -> None:
         """Play a sound file regardless of enabled state (for mute/unmute feedback)."""
-        # Resolve the path
-        resolved_path = self._resolve_sound_path(sound_path)
+        # Coalesce repeats of the same sound arriving in quick succession
+        now = time.monotonic()
+        last_played = self._last_played.get(sound_path)
+        if last_played is not None and now - last_played < SOUND_COALESCE_SECONDS:
+            logger.debug(f"Sound coalesced with previous play: {sound_path}")
+            return
+        self._last_played[sound_path] = now
+
+        # Preloaded sounds play in-process; play() returns immediately
+        players = self._pool.get(sound_path)
+        if players:
+            index = self._pool_index[sound_path]
+            self._pool_index[sound_path] = (index + 1) % len(players)
+            player = players[index]
+            player.setCurrentTime_(0.0)
+            player.play()
+            return
+
+        # Resolve the path (cached for configured sounds)
+        resolved_path = self._resolved.get(sound_path)
+        if resolved_path is None:
+            resolved_path = self._resolve_sound_path(sound_path)
+            exists = os.path.exists(resolved_path)
+        else:
+            exists = self._exists[sound_path]
 
         # Verify sound file exists
-        if not resolved_path.exists():
+        if not exists:
             logger.warning(f"Sound file not found: {resolved_path}")
             # Fall back to system beep
             self._system_beep()
             return
 
-        # Play sound in background thread to not block
-        def _play():
-            with self._lock:
-                try:
-                    subprocess.run(
-                        ["afplay", str(resolved_path)],
-                        check=True,
-                        capture_output=True,
-                    )
-                except subprocess.CalledProcessError as e:
-                    logger.error(f"Failed to play sound: {e}")
-                except FileNotFoundError:
-                    logger.error("afplay command not found")
-                    self._system_beep()
-
-        thread = threading.Thread(target=_play, daemon=True)
-        thread.start()
+        if AFPLAY_PATH is None:
+            self._system_beep()
+            return
+
+        # Hand off to the afplay worker to not block
+        self._start_afplay_worker()
+        try:
+            self._afplay_queue.put_nowait(resolved_path)
+        except queue.Full:
+            logger.warning(f"Sound queue full, dropping: {resolved_path}")
+
+    def close(self) -> None:
+        """Stop the afplay worker after it has started the sounds already queued.
+
+        A sound played after close() starts a new worker.
+        """
+        with self._afplay_worker_lock:
+            worker = self._afplay_worker
+            self._afplay_worker = None
+        if worker is None:
+            return
+        self._afplay_queue.put(None)
+        worker.join()
+
+    def _start_afplay_worker(self) -> None:
+        """Start the afplay worker if it isn't running yet."""
+        if self._afplay_worker is not None:
+            return
+        with self._afplay_worker_lock:
+            if self._afplay_worker is None:
+                self._afplay_worker = threading.Thread(
+                    target=self._afplay_loop, daemon=True
+                )
+                self._afplay_worker.start()
+
+    def _afplay_loop(self) -> None:
+        """Start afplay for queued sound files until close() queues None."""
+        _set_thread_qos_user_interactive()
+        while True:
+            for resolved_path in self._next_afplay_batch():
+                if resolved_path is None:
+                    return
+                self._run_afplay(resolved_path)
+
+    def _next_afplay_batch(self) -> list[str | None]:
+        """Wait for a queued sound, then drain everything queued behind it.
+
+        Consecutive duplicates in the batch are kept only once, so a burst of
+        the same sound plays a single time.
+        """
+        batch = [self._afplay_queue.get()]
+        while True:
+            try:
+                resolved_path = self._afplay_queue.get_nowait()
+            except queue.Empty:
+                return batch
+            if resolved_path != batch[-1]:
+                batch.append(resolved_path)
+
+    def _reap_afplay_processes(self) -> None:
+        """Reap afplay processes that have exited, logging failures."""
+        running = []
+        for pid in self._afplay_pids:
+            try:
+                waited_pid, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                continue
+            if waited_pid == 0:
+                running.append(pid)
+                continue
+            returncode = os.waitstatus_to_exitcode(status)
+            if returncode != 0:
+                logger.error(f"Failed to play sound: afplay exited with {returncode}")
+        self._afplay_pids = running
+
+    def _run_afplay(self, resolved_path: str) -> None:
+        """Start afplay for a sound file without waiting for it to finish.
+
+        Sounds overlap rather than queue behind each other; if too many are
+        already playing, the sound is dropped. afplay is started with
+        posix_spawn, which avoids copying the parent's page tables like fork.
+        """
+        self._reap_afplay_processes()
+        if len(self._afplay_pids) >= MAX_AFPLAY_PROCESSES:
+            logger.warning(f"Too many sounds playing, dropping: {resolved_path}")
+            return
+
+        try:
+            pid = os.posix_spawn(
+                AFPLAY_PATH,
+                [AFPLAY_PATH, resolved_path],
+                os.environ,
+                file_actions=_AFPLAY_FILE_ACTIONS,
+            )
+        except FileNotFoundError:
+            logger.error("afplay command not found")
+            self._system_beep()
+            return
+
+        self._afplay_pids.append(pid)
 
     def _system_beep(self) -> None:
         """Fall back to system beep."""
-        try:
+        if NSBeep is not None:
             # Use macOS system beep via AppKit
-            from AppKit import NSBeep
-
             NSBeep()
-        except ImportError:
+        else:
             # Last resort: terminal beep
             print("\a", end="", flush=True)
 
     def list_available_sounds(self) -> list[str]:
         """List available system sounds."""
-        sounds_dir = Path("/System/Library/Sounds")
-        if sounds_dir.exists():
-            return sorted([str(f) for f in sounds_dir.glob("*.aiff")])
-        return []
+        return list(_list_system_sounds())
 
     def test_sounds(self) -> None:
         """Test both notification sounds."""
-        import time
-
         print("Testing chat sound...")
         self.play_chat_sound()
         time.sleep(1.5)
@@ -1,18 +1,24 @@
 """Configuration settings for Teams Notifier."""
 
+import functools
 import json
 import os
+import re
 import sys
 from dataclasses import dataclass, field
-from pathlib import Path
 from typing import Any
 
 from dotenv import load_dotenv
 
 
-def _find_and_load_dotenv() -> None:
-    """Find and load .env file from multiple possible locations."""
+def _find_and_load_dotenv() -> str | None:
+    """Find and load .env file from multiple possible locations.
+
+    Returns:
+        The path of the loaded .env file, or None if none was found.
+    """
     # Possible locations for .env file:
+    # 0. Explicit path from TEAMS_NOTIFIER_ENV
     # 1. Next to the .app bundle (for macOS app)
     # 2. In ~/.config/teams-notifier/
     # 3. In user's home directory
@@ -20,33 +26,42 @@ def _find_and_load_dotenv() -> None:
 
     possible_paths = []
 
+    explicit_path = os.environ.get("TEAMS_NOTIFIER_ENV")
+    if explicit_path:
+        possible_paths.append(explicit_path)
+
     # If running as a bundled app, check next to the .app
     if getattr(sys, "frozen", False):
-        # Running as compiled app
-        app_dir = Path(
-            sys.executable
-        ).parent.parent.parent.parent  # .app/Contents/MacOS/exe -> .app parent
-        possible_paths.append(app_dir / ".env")
-        possible_paths.append(app_dir / "teams-notifier.env")
+        # Running as compiled app: .app/Contents/MacOS/exe -> .app parent
+        app_dir = os.path.dirname(sys.executable)
+        for _ in range(3):
+            app_dir = os.path.dirname(app_dir)
+        possible_paths.append(os.path.join(app_dir, ".env"))
+        possible_paths.append(os.path.join(app_dir, "teams-notifier.env"))
+
+    home = os.path.expanduser("~")
 
     # Check ~/.config/teams-notifier/
-    config_dir = Path.home() / ".config" / "teams-notifier"
-    possible_paths.append(config_dir / ".env")
+    possible_paths.append(os.path.join(home, ".config", "teams-notifier", ".env"))
 
     # Check home directory
-    possible_paths.append(Path.home() / ".teams-notifier.env")
+    possible_paths.append(os.path.join(home, ".teams-notifier.env"))
 
     # Check current working directory (development)
-    possible_paths.append(Path.cwd() / ".env")
+    possible_paths.append(os.path.join(os.getcwd(), ".env"))
 
-    # Try each path
+    # Try each path (a single stat per candidate)
     for env_path in possible_paths:
-        if env_path.exists():
-            load_dotenv(env_path)
-            return
+        try:
+            os.stat(env_path)
+        except OSError:
+            continue
+        load_dotenv(env_path)
+        return env_path
 
     # Fall back to default load_dotenv behavior
     load_dotenv()
+    return None
 
 
 # Load environment variables from .env file
@@ -108,6 +123,18 @@ def _get_chat_sound_patterns() -> list[str]:
     return ["basic", "ping", "notify"]
 
 
+@functools.lru_cache(maxsize=8)
+def _compile_sound_patterns(patterns: tuple[str, ...]) -> re.Pattern[str]:
+    """Compile sound name substrings into a single case-insensitive regex.
+
+    Cached per patterns tuple, so reassigning the patterns yields a new regex.
+    An empty pattern tuple compiles to a regex that never matches.
+    """
+    if not patterns:
+        return re.compile(r"(?!)")
+    return re.compile("|".join(map(re.escape, patterns)), re.IGNORECASE)
+
+
 def _get_webhook_payload(env_var: str) -> dict[str, Any] | None:
     """Get webhook payload from environment variable.
 
@@ -147,9 +174,13 @@ def _get_webhook_payload_clear() -> dict[str, Any] | None:
     return _get_webhook_payload("WEBHOOK_PAYLOAD_CLEAR")
 
 
-@dataclass
+@dataclass(slots=True)
 class Config:
-    """Application configuration."""
+    """Application configuration.
+
+    Instances use slots, so assigning an unknown attribute raises
+    AttributeError.
+    """
 
     # Logging
     log_level: str = field(default_factory=_get_log_level)
@@ -210,6 +241,23 @@ class Config:
     urgent_sound_patterns: list[str] = field(default_factory=_get_urgent_sound_patterns)
     chat_sound_patterns: list[str] = field(default_factory=_get_chat_sound_patterns)
 
+    def __post_init__(self) -> None:
+        """Intern the sound paths passed to (or defaulted by) the constructor.
+
+        Sound paths are used as dict keys on every play; interning them lets
+        lookups succeed on identity before comparing string contents. Paths
+        assigned after construction are not interned.
+        """
+        self.chat_sound = sys.intern(self.chat_sound)
+        self.urgent_sound = sys.intern(self.urgent_sound)
+        self.muted_sound = sys.intern(self.muted_sound)
+        self.unmuted_sound = sys.intern(self.unmuted_sound)
+
+    @property
+    def urgent_sound_regex(self) -> re.Pattern[str]:
+        """The urgent sound patterns compiled into one regex."""
+        return _compile_sound_patterns(tuple(self.urgent_sound_patterns))
+
 
 # Global config instance
 config = Config()
@@ -4,6 +4,9 @@ import asyncio
 import logging
 import signal
 import sys
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime
 
 # Configure logging FIRST, before any other imports that might create loggers
 # Import config to load .env and get log level
@@ -22,12 +25,18 @@ logging.basicConfig(
 # Also set level on the root logger explicitly
 logging.getLogger().setLevel(log_level)
 
+# The log format doesn't use thread or process fields, so skip collecting
+# them for every record
+logging.logThreads = False
+logging.logProcesses = False
+logging.logMultiprocessing = False
+
 logger = logging.getLogger(__name__)
 
 # Now import other modules (their loggers will inherit the configured level)
 from nicegui import ui, app  # noqa: E402
 
-from .monitors.log_stream_monitor import (  # noqa: E402
+from .monitors import (  # noqa: E402
     LogStreamMonitor,
     NotificationType,
     TeamsNotification,
@@ -36,31 +45,115 @@ from .audio.sound_player import SoundPlayer  # noqa: E402
 from .ui.alert_window import get_alert_window  # noqa: E402
 from .webhook import WebhookSender  # noqa: E402
 
+
+@dataclass(frozen=True)
+class Services:
+    """Components used by the notification, reset and mute handlers.
+
+    Created once at startup; handlers capture it in a closure instead of
+    looking up module globals on every call.
+    """
+
+    sound_player: SoundPlayer | None = None
+    webhook_sender: WebhookSender | None = None
+
+
 # Global instances
 monitor: LogStreamMonitor | None = None
-sound_player: SoundPlayer | None = None
-webhook_sender: WebhookSender | None = None
+services = Services()
+
+
+# Per notification type: webhook type, SoundPlayer method, AlertWindow method
+_NOTIFICATION_ACTIONS = {
+    NotificationType.CHAT: ("message", "play_chat_sound", "notify_chat"),
+    NotificationType.URGENT: ("urgent", "play_urgent_sound", "notify_urgent"),
+}
+
+
+def make_notification_handler(
+    services: Services,
+) -> Callable[[TeamsNotification], None]:
+    """Create the handler for incoming Teams notifications."""
+    player = services.sound_player
+    sender = services.webhook_sender
+    if sender is not None and not sender.enabled:
+        sender = None
+    # The alert window is a process-wide singleton, so look it up once and
+    # bind the per-type methods up front
+    alert = get_alert_window()
+    bound_actions = {}
+    for notification_type, actions in _NOTIFICATION_ACTIONS.items():
+        webhook_type, play_sound, notify = actions
+        bound_actions[notification_type] = (
+            webhook_type,
+            getattr(player, play_sound) if player is not None else None,
+            getattr(alert, notify),
+        )
+
+    def handle_notification(notification: TeamsNotification) -> None:
+        """Handle incoming Teams notification."""
+        actions = bound_actions.get(notification.type)
+        if actions is None:
+            return
+        webhook_type, play_sound, notify = actions
+
+        logger.info(f"{notification.type.name.capitalize()} notification received")
+        notify()
+        if play_sound is not None and not alert.muted:
+            play_sound()
+        if sender is not None:
+            sender.send_notification_sync(webhook_type)
+
+    return handle_notification
+
+
+def register_alert_callbacks(services: Services, log_prefix: str = "") -> None:
+    """Register the reset and mute callbacks on the alert window."""
+    alert = get_alert_window()
+    player = services.sound_player
+    sender = services.webhook_sender
 
+    # Register webhook callback for reset/clear button
+    def on_reset():
+        if sender:
+            sender.send_notification_sync("clear")
+            logger.info(f"{log_prefix}Clear notification sent to webhook")
 
-def handle_notification(notification: TeamsNotification) -> None:
-    """Handle incoming Teams notification."""
-    alert = get_alert_window()
+    # Register mute callback to play sounds
+    def on_mute(muted: bool):
+        if player:
+            if muted:
+                player.play_muted_sound()
+            else:
+                player.play_unmuted_sound()
+        logger.info(
+            f"{log_prefix}Mute state changed: {'muted' if muted else 'unmuted'}"
+        )
 
-    if notification.type == NotificationType.CHAT:
-        logger.info("Chat notification received")
-        alert.notify_chat()
-        if sound_player and not alert.muted:
-            sound_player.play_chat_sound()
-        if webhook_sender:
-            webhook_sender.send_notification_sync("message")
+    alert.on_reset(on_reset)
+    alert.on_mute(on_mute)
 
-    elif notification.type == NotificationType.URGENT:
-        logger.info("Urgent notification received")
-        alert.notify_urgent()
-        if sound_player and not alert.muted:
-            sound_player.play_urgent_sound()
-        if webhook_sender:
-            webhook_sender.send_notification_sync("urgent")
+
+async def bind_event_loop() -> None:
+    """Let the webhook sender schedule sends from other threads on this loop."""
+    if services.webhook_sender is not None:
+        services.webhook_sender.bind_loop(asyncio.get_running_loop())
+
+
+def create_services(log_prefix: str = "") -> Services:
+    """Create the sound player and webhook sender."""
+    webhook_sender = WebhookSender(
+        webhook_url=config.webhook_url,
+        payload_message=config.webhook_payload_message,
+        payload_urgent=config.webhook_payload_urgent,
+        payload_clear=config.webhook_payload_clear,
+        bearer_token=config.webhook_bearer,
+    )
+    if webhook_sender.enabled:
+        logger.info(f"Webhook notifications enabled: {config.webhook_url}")
+        if config.webhook_bearer:
+            logger.info(f"{log_prefix}Webhook authorization: Bearer token configured")
+    return Services(sound_player=SoundPlayer(), webhook_sender=webhook_sender)
 
 
 def setup_signal_handlers() -> None:
@@ -79,55 +172,53 @@ def setup_signal_handlers() -> None:
 @ui.page("/")
 def main_page():
     """Main page with the alert light."""
-    alert = get_alert_window()
+    register_alert_callbacks(services)
+    get_alert_window().build()
 
-    # Register webhook callback for reset/clear button
-    def on_reset():
-        if webhook_sender:
-            webhook_sender.send_notification_sync("clear")
-            logger.info("Clear notification sent to webhook")
 
-    # Register mute callback to play sounds
-    def on_mute(muted: bool):
-        if sound_player:
-            if muted:
-                sound_player.play_muted_sound()
-            else:
-                sound_player.play_unmuted_sound()
-        logger.info(f"Mute state changed: {'muted' if muted else 'unmuted'}")
-
-    alert.on_reset(on_reset)
-    alert.on_mute(on_mute)
-    alert.build()
+def _reapply_on_top() -> None:
+    """Re-apply always-on-top to the native window."""
+    try:
+        if app.native.main_window:
+            app.native.main_window.set_always_on_top(True)
+    except Exception as e:
+        logger.debug(f"Could not re-apply always-on-top: {e}")
 
 
 async def set_always_on_top():
-    """Set the window to always be on top after it's created."""
-    await asyncio.sleep(1.5)  # Wait for window to be fully ready
+    """Keep the window on top once it's created.
+
+    The window is created with on_top set (see run()); the "shown" and
+    "restored" events re-apply it as soon as the native window can accept
+    it, so there is no fixed wait for the window to appear.
+    """
+    if hasattr(app.native, "on"):
+        app.native.on("shown", _reapply_on_top)
+        app.native.on("restored", _reapply_on_top)
+        return
+
+    # Older NiceGUI versions don't forward native window events, so wait for
+    # the window and fall back to an infrequent poll there
+    await asyncio.sleep(1.5)
     try:
-        # Use pywebview's on_top property
+        # The native window lives in pywebview's process; set it via the proxy
         if app.native.main_window:
-            app.native.main_window.on_top = True
+            app.native.main_window.set_always_on_top(True)
             logger.info("Window set to always-on-top via pywebview")
     except Exception as e:
         logger.warning(f"Could not set always-on-top: {e}")
 
-    # Periodically re-apply on_top to ensure it stays on top
     async def keep_on_top():
         while True:
-            await asyncio.sleep(5.0)
-            try:
-                if app.native.main_window:
-                    app.native.main_window.on_top = True
-            except Exception:
-                pass
+            await asyncio.sleep(60.0)
+            _reapply_on_top()
 
     asyncio.create_task(keep_on_top())
 
 
 def run():
     """Run the Teams Notifier application."""
-    global monitor, sound_player, webhook_sender
+    global monitor, services
 
     logger.info("Starting Teams Notifier...")
 
@@ -135,22 +226,11 @@ def run():
     setup_signal_handlers()
 
     # Initialize components
-    sound_player = SoundPlayer()
-    webhook_sender = WebhookSender(
-        webhook_url=config.webhook_url,
-        payload_message=config.webhook_payload_message,
-        payload_urgent=config.webhook_payload_urgent,
-        payload_clear=config.webhook_payload_clear,
-        bearer_token=config.webhook_bearer,
-    )
-    if webhook_sender.enabled:
-        logger.info(f"Webhook notifications enabled: {config.webhook_url}")
-        if config.webhook_bearer:
-            logger.info("Webhook authorization: Bearer token configured")
+    services = create_services()
 
     # Start notification monitor (uses log stream to detect Teams notifications)
     monitor = LogStreamMonitor()
-    monitor.add_callback(handle_notification)
+    monitor.add_callback(make_notification_handler(services))
     monitor.start()
 
     port = 8080
@@ -159,8 +239,12 @@ def run():
     # Note: Menu bar disabled due to thread conflicts with NiceGUI native mode
     # The alert window itself provides all necessary controls
 
-    # Set always-on-top after startup
+    # Create the window on top and keep it there after startup
+    app.native.window_args["on_top"] = True
     app.on_startup(set_always_on_top)
+    app.on_startup(bind_event_loop)
+
+    # NiceGUI's uvicorn server picks uvloop automatically when it is installed
 
     # Configure NiceGUI for small native window
     ui.run(
@@ -177,22 +261,12 @@ def run():
 
 def run_demo():
     """Run in demo mode with simulated notifications."""
-    global sound_player, webhook_sender
+    global services
 
     logger.info("Starting Teams Notifier in DEMO mode...")
 
-    sound_player = SoundPlayer()
-    webhook_sender = WebhookSender(
-        webhook_url=config.webhook_url,
-        payload_message=config.webhook_payload_message,
-        payload_urgent=config.webhook_payload_urgent,
-        payload_clear=config.webhook_payload_clear,
-        bearer_token=config.webhook_bearer,
-    )
-    if webhook_sender.enabled:
-        logger.info(f"Webhook notifications enabled: {config.webhook_url}")
-        if config.webhook_bearer:
-            logger.info("[DEMO] Webhook authorization: Bearer token configured")
+    services = create_services(log_prefix="[DEMO] ")
+    handle_notification = make_notification_handler(services)
 
     async def simulate_notifications():
         """Simulate notifications for testing."""
@@ -200,8 +274,6 @@ def run_demo():
 
         await asyncio.sleep(3)  # Wait for UI to be ready
 
-        alert = get_alert_window()
-
         while True:
             # Random delay between 5-15 seconds
             delay = random.uniform(5, 15)
@@ -210,46 +282,25 @@ def run_demo():
             # Random notification type
             if random.random() < 0.3:  # 30% chance of urgent
                 logger.info("[DEMO] Simulating urgent notification")
-                alert.notify_urgent()
-                if sound_player and not alert.muted:
-                    sound_player.play_urgent_sound()
-                if webhook_sender:
-                    webhook_sender.send_notification_sync("urgent")
+                notification_type = NotificationType.URGENT
             else:
                 logger.info("[DEMO] Simulating chat notification")
-                alert.notify_chat()
-                if sound_player and not alert.muted:
-                    sound_player.play_chat_sound()
-                if webhook_sender:
-                    webhook_sender.send_notification_sync("message")
+                notification_type = NotificationType.CHAT
+            handle_notification(
+                TeamsNotification(type=notification_type, timestamp=datetime.now())
+            )
 
     @ui.page("/")
     def demo_page():
-        alert = get_alert_window()
-
-        # Register webhook callback for reset/clear button
-        def on_reset():
-            if webhook_sender:
-                webhook_sender.send_notification_sync("clear")
-                logger.info("[DEMO] Clear notification sent to webhook")
-
-        # Register mute callback to play sounds
-        def on_mute(muted: bool):
-            if sound_player:
-                if muted:
-                    sound_player.play_muted_sound()
-                else:
-                    sound_player.play_unmuted_sound()
-            logger.info(f"[DEMO] Mute state changed: {'muted' if muted else 'unmuted'}")
-
-        alert.on_reset(on_reset)
-        alert.on_mute(on_mute)
-        alert.build()
+        register_alert_callbacks(services, log_prefix="[DEMO] ")
+        get_alert_window().build()
         # Start simulation
         asyncio.create_task(simulate_notifications())
 
-    # Set always-on-top after startup
+    # Create the window on top and keep it there after startup
+    app.native.window_args["on_top"] = True
     app.on_startup(set_always_on_top)
+    app.on_startup(bind_event_loop)
 
     ui.run(
         port=8080,
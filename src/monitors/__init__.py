@@ -1,5 +1,5 @@
 """Notification monitors for Teams Notifier."""
 
-from .log_stream_monitor import LogStreamMonitor
+from .log_stream_monitor import LogStreamMonitor, NotificationType, TeamsNotification
 
-__all__ = ["LogStreamMonitor"]
+__all__ = ["LogStreamMonitor", "NotificationType", "TeamsNotification"]
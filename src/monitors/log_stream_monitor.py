@@ -6,28 +6,42 @@ This is more reliable than NSDistributedNotificationCenter for the new Teams app
 """
 
 import logging
+import os
 import re
+import selectors
 import subprocess
 import threading
 from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import datetime
-from enum import Enum, auto
+from enum import IntEnum
 
 from ..config import config
 
 logger = logging.getLogger(__name__)
 
+# Bytes requested per read from the log stream pipe
+READ_CHUNK_SIZE = 65536
 
-class NotificationType(Enum):
-    """Type of Teams notification."""
+# How often the monitor thread wakes to check for stop() while idle
+SELECT_TIMEOUT_SECONDS = 0.25
 
-    CHAT = auto()
-    URGENT = auto()
-    UNKNOWN = auto()
+# Maximum number of distinct sound names whose classification is memoized
+SOUND_CACHE_SIZE = 64
 
 
-@dataclass
+class NotificationType(IntEnum):
+    """Type of Teams notification.
+
+    An IntEnum so comparisons and dict lookups use int's C implementations
+    rather than Enum's Python-level __hash__.
+    """
+
+    CHAT = 1
+    URGENT = 2
+
+
+@dataclass(slots=True, frozen=True)
 class TeamsNotification:
     """Represents a Teams notification."""
 
@@ -53,60 +67,130 @@ class LogStreamMonitor:
     # Example: "Queuing action present for app com.microsoft.teams2 items: ["761F-2077"]"
     NOTIFICATION_PATTERN = re.compile(
         r"Queuing action present for app (com\.microsoft\.teams2?)\s+items:",
-        re.IGNORECASE,
+        re.ASCII,
     )
 
     # Pattern to match notification sound being played
     # Example: "Playing notification sound { nam: a8_teams_basic_notification_r4_ping } for com.microsoft.teams2"
     SOUND_PATTERN = re.compile(
-        r"Playing notification sound \{ nam: ([^\s}]+) \} for com\.microsoft\.teams",
-        re.IGNORECASE,
+        r"Playing notification sound \{ nam: (?P<sound_name>[^\s}]+) \} for com\.microsoft\.teams",
+        re.ASCII,
+    )
+
+    # Both patterns fused into one alternation, so each line is scanned once.
+    # The matching branch is identified by which named group participated.
+    # Matching is case-sensitive, like the TEAMS_MARKER prefilter and the log
+    # stream predicate, which only let exact-case lines through anyway.
+    # re.ASCII keeps \s to ASCII whitespace.
+    COMBINED_PATTERN = re.compile(
+        rf"(?P<sound>{SOUND_PATTERN.pattern})"
+        rf"|(?P<notification>{NOTIFICATION_PATTERN.pattern})",
+        re.ASCII,
     )
 
+    # Every line either pattern can match contains this; cheap prefilter
+    TEAMS_MARKER = "com.microsoft.teams"
+    TEAMS_MARKER_BYTES = TEAMS_MARKER.encode()
+
     def __init__(self):
-        self._callbacks: list[Callable[[TeamsNotification], None]] = []
+        # Immutable snapshot, replaced under _callbacks_lock on add/remove so
+        # dispatch from the monitor thread can iterate it without locking
+        self._callbacks: tuple[Callable[[TeamsNotification], None], ...] = ()
+        self._callbacks_lock = threading.Lock()
         self._running = False
         self._process: subprocess.Popen | None = None
         self._thread: threading.Thread | None = None
-        self._last_notification_time: datetime | None = None
-        self._debounce_seconds = (
-            1.0  # Ignore duplicate notifications within this window
-        )
+        self._debounce_seconds = 1.0  # Repeats within this window are dropped
         self._pending_notification_type: NotificationType | None = (
             None  # Track sound-based type
         )
+        # The first notification is dispatched at once and opens a debounce
+        # window; inside it only a higher priority is dispatched again. The
+        # window ends when _window_timer fires. Guarded by _window_lock.
+        self._window_lock = threading.Lock()
+        self._window_type: NotificationType | None = None  # Highest dispatched
+        self._window_timer: threading.Timer | None = None
+        # Urgent sound patterns, compiled once into a case-insensitive regex
+        self._urgent_sound_regex = config.urgent_sound_regex
+        # Classification per sound name; Teams only plays a handful of sounds,
+        # so the regex runs once per name instead of once per line
+        self._sound_types: dict[str, NotificationType] = {}
+        # Whether debug messages are logged; checked per line on the hot path,
+        # so it is captured here and refreshed when monitoring starts
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
 
     def add_callback(self, callback: Callable[[TeamsNotification], None]) -> None:
         """Register a callback for Teams notifications."""
-        self._callbacks.append(callback)
+        with self._callbacks_lock:
+            self._callbacks = (*self._callbacks, callback)
 
     def remove_callback(self, callback: Callable[[TeamsNotification], None]) -> None:
         """Remove a registered callback."""
-        if callback in self._callbacks:
-            self._callbacks.remove(callback)
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                callbacks = list(self._callbacks)
+                callbacks.remove(callback)
+                self._callbacks = tuple(callbacks)
 
     def _dispatch_notification(self, notification: TeamsNotification) -> None:
         """Dispatch notification to all registered callbacks."""
         for callback in self._callbacks:
             try:
                 callback(notification)
-            except Exception as e:
-                logger.error(f"Callback error: {e}")
+            except Exception:
+                logger.exception("Callback error")
 
-    def _should_process_notification(self) -> bool:
-        """Check if we should process this notification (debouncing)."""
-        now = datetime.now()
-        if self._last_notification_time is None:
-            self._last_notification_time = now
-            return True
+    def _queue_notification(
+        self, notification_type: NotificationType, line: str
+    ) -> None:
+        """Dispatch a notification unless the debounce window already covers it.
+
+        A notification outside a window is dispatched immediately and opens
+        one. Inside the window, notifications of the same or lower priority
+        are dropped; a higher priority is dispatched once more.
+        """
+        with self._window_lock:
+            window_type = self._window_type
+            if window_type is not None and notification_type <= window_type:
+                if self._log_debug:
+                    logger.debug(
+                        "Dropping %s notification within %s window",
+                        notification_type.name,
+                        window_type.name,
+                    )
+                return
 
-        elapsed = (now - self._last_notification_time).total_seconds()
-        if elapsed < self._debounce_seconds:
-            logger.debug(f"Debouncing notification (elapsed: {elapsed:.2f}s)")
-            return False
+            self._window_type = notification_type
+            if window_type is None:
+                self._window_timer = threading.Timer(
+                    self._debounce_seconds, self._end_window
+                )
+                self._window_timer.daemon = True
+                self._window_timer.start()
+
+        self._dispatch_detected(notification_type, line)
+
+    def _end_window(self) -> None:
+        """End the debounce window, so the next notification is dispatched."""
+        with self._window_lock:
+            if self._window_timer is not None:
+                self._window_timer.cancel()
+                self._window_timer = None
+            self._window_type = None
+
+    def _dispatch_detected(
+        self, notification_type: NotificationType, line: str
+    ) -> None:
+        """Build the notification for a detected event and dispatch it."""
+        notification = TeamsNotification(
+            type=notification_type,
+            timestamp=datetime.now(),
+            # The raw log line is only kept for debugging
+            raw_data={"log_line": line} if self._log_debug else None,
+        )
 
-        self._last_notification_time = now
-        return True
+        logger.info("Teams notification detected: %s", notification_type.name)
+        self._dispatch_notification(notification)
 
     def _classify_by_sound(self, sound_name: str) -> NotificationType:
         """Classify notification type based on the sound being played.
@@ -118,52 +202,81 @@ class LogStreamMonitor:
         Sound patterns are configurable via URGENT_SOUND_PATTERNS and
         CHAT_SOUND_PATTERNS environment variables.
         """
-        sound_lower = sound_name.lower()
+        notification_type = self._sound_types.get(sound_name)
+        if notification_type is not None:
+            return notification_type
 
         # Check if this is an urgent/priority sound
-        for pattern in config.urgent_sound_patterns:
-            if pattern in sound_lower:
+        match = self._urgent_sound_regex.search(sound_name)
+        if match:
+            if self._log_debug:
                 logger.debug(
-                    f"Detected URGENT sound (pattern: '{pattern}' in '{sound_name}')"
+                    "Detected URGENT sound (pattern: '%s' in '%s')",
+                    match.group(0).lower(),
+                    sound_name,
                 )
-                return NotificationType.URGENT
+            notification_type = NotificationType.URGENT
+        else:
+            # Default to CHAT for basic notification sounds
+            if self._log_debug:
+                logger.debug("Detected CHAT sound: '%s'", sound_name)
+            notification_type = NotificationType.CHAT
 
-        # Default to CHAT for basic notification sounds
-        logger.debug(f"Detected CHAT sound: '{sound_name}'")
-        return NotificationType.CHAT
+        if len(self._sound_types) < SOUND_CACHE_SIZE:
+            self._sound_types[sound_name] = notification_type
+        return notification_type
 
     def _process_log_line(self, line: str) -> None:
         """Process a single log line and detect Teams notifications."""
-        # First, check if this is a sound being played (gives us the notification type)
-        sound_match = self.SOUND_PATTERN.search(line)
-        if sound_match:
-            sound_name = sound_match.group(1)
-            self._pending_notification_type = self._classify_by_sound(sound_name)
-            logger.debug(
-                f"Sound detected: {sound_name} -> {self._pending_notification_type.name}"
-            )
-            return  # Sound line comes before/after the notification line
+        # Skip lines that can't match either pattern without running the regex
+        if self.TEAMS_MARKER not in line:
+            return
 
-        # Check if this is a Teams notification event
-        if self.NOTIFICATION_PATTERN.search(line):
-            logger.debug(f"Teams notification detected in log: {line[:200]}")
+        match = self.COMBINED_PATTERN.search(line)
+        if match is None:
+            return
 
-            if not self._should_process_notification():
-                self._pending_notification_type = None  # Clear pending type
+        # A sound being played gives us the notification type
+        if match.group("sound") is not None:
+            sound_name = match.group("sound_name")
+            sound_type = self._classify_by_sound(sound_name)
+            if self._log_debug:
+                logger.debug("Sound detected: %s -> %s", sound_name, sound_type.name)
+            # A sound inside an open window belongs to a notification already
+            # dispatched in it; only a higher priority is dispatched again
+            with self._window_lock:
+                window_type = self._window_type
+                if window_type is not None and sound_type > window_type:
+                    self._window_type = sound_type
+            if window_type is not None:
+                if sound_type > window_type:
+                    self._dispatch_detected(sound_type, line)
                 return
+            self._pending_notification_type = sound_type
+            return  # Sound line comes before/after the notification line
 
-            # Use pending type from sound detection, or default to CHAT
-            notification_type = self._pending_notification_type or NotificationType.CHAT
-            self._pending_notification_type = None  # Reset for next notification
+        # Otherwise this is a Teams notification event
+        if self._log_debug:
+            logger.debug("Teams notification detected in log: %s", line[:200])
 
-            notification = TeamsNotification(
-                type=notification_type,
-                timestamp=datetime.now(),
-                raw_data={"log_line": line},
-            )
+        # Use pending type from sound detection, or default to CHAT
+        notification_type = self._pending_notification_type or NotificationType.CHAT
+        self._pending_notification_type = None  # Reset for next notification
+        self._queue_notification(notification_type, line)
+
+    def _process_chunk(self, data: bytes) -> bytes:
+        """Process the complete lines in a chunk of log stream output.
 
-            logger.info(f"Teams notification detected: {notification_type.name}")
-            self._dispatch_notification(notification)
+        Only lines containing the Teams marker are decoded and processed.
+
+        Returns:
+            The trailing partial line, to be prepended to the next chunk.
+        """
+        *lines, pending = data.split(b"\n")
+        for raw_line in lines:
+            if self.TEAMS_MARKER_BYTES in raw_line:
+                self._process_log_line(raw_line.decode("utf-8", "replace").strip())
+        return pending
 
     def _monitor_loop(self) -> None:
         """Main monitoring loop that reads from log stream."""
@@ -171,10 +284,14 @@ class LogStreamMonitor:
 
         # Build the log stream command
         # Monitor NotificationCenter process for Teams-related events
+        # Only the two messages we parse are let through, so logd filters out
+        # everything else before it is formatted and written to the pipe.
+        # "com.microsoft.teams" also matches the new com.microsoft.teams2 app.
         predicate = (
             'process == "NotificationCenter" AND '
-            '(eventMessage CONTAINS "com.microsoft.teams2" OR '
-            'eventMessage CONTAINS "com.microsoft.teams")'
+            'eventMessage CONTAINS "com.microsoft.teams" AND '
+            '(eventMessage CONTAINS "Queuing action present" OR '
+            'eventMessage CONTAINS "Playing notification sound")'
         )
 
         cmd = [
@@ -192,22 +309,34 @@ class LogStreamMonitor:
                 cmd,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,  # Line buffered
+                bufsize=0,  # Unbuffered binary pipe, read in large chunks below
             )
 
             logger.info("Log stream process started")
 
-            # Read lines from the log stream
-            while self._running and self._process.poll() is None:
-                line = self._process.stdout.readline()
-                if line:
-                    self._process_log_line(line.strip())
+            # Read the log stream in chunks and split lines ourselves. The pipe
+            # is non-blocking and polled with a timeout, so stop() is noticed
+            # promptly even when no log lines arrive.
+            fd = self._process.stdout.fileno()
+            os.set_blocking(fd, False)
+            pending = b""
+            with selectors.DefaultSelector() as selector:
+                selector.register(fd, selectors.EVENT_READ)
+                while self._running:
+                    if not selector.select(timeout=SELECT_TIMEOUT_SECONDS):
+                        continue
+                    try:
+                        chunk = os.read(fd, READ_CHUNK_SIZE)
+                    except BlockingIOError:
+                        continue
+                    if not chunk:
+                        break  # log stream exited
+                    pending = self._process_chunk(pending + chunk)
 
             logger.info("Log stream monitor loop ended")
 
         except Exception as e:
-            logger.error(f"Error in log stream monitor: {e}")
+            logger.error("Error in log stream monitor: %s", e)
         finally:
             if self._process:
                 self._process.terminate()
@@ -219,6 +348,7 @@ class LogStreamMonitor:
             return
 
         self._running = True
+        self._log_debug = logger.isEnabledFor(logging.DEBUG)
         self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self._thread.start()
 
@@ -231,6 +361,8 @@ class LogStreamMonitor:
 
         self._running = False
 
+        self._end_window()
+
         if self._process:
             self._process.terminate()
             try:
@@ -2,7 +2,8 @@
 
 import asyncio
 import logging
-import queue
+import threading
+from collections.abc import Callable
 from enum import Enum, auto
 
 from nicegui import ui
@@ -20,6 +21,68 @@ class AlertState(Enum):
     URGENT = auto()
 
 
+# State after a notification, keyed by (current state, notification state).
+# A chat only lights up an idle light; urgent always takes priority.
+_NEXT_STATE = {
+    (AlertState.IDLE, AlertState.CHAT): AlertState.CHAT,
+    (AlertState.CHAT, AlertState.CHAT): AlertState.CHAT,
+    (AlertState.URGENT, AlertState.CHAT): AlertState.URGENT,
+    (AlertState.IDLE, AlertState.URGENT): AlertState.URGENT,
+    (AlertState.CHAT, AlertState.URGENT): AlertState.URGENT,
+    (AlertState.URGENT, AlertState.URGENT): AlertState.URGENT,
+}
+
+# Glow style around the light for each state, and when muted (dark blue)
+_GLOW_STYLES = {
+    AlertState.IDLE: "box-shadow: 0 0 30px rgba(34, 197, 94, 0.5);",
+    AlertState.CHAT: "box-shadow: 0 0 30px rgba(234, 179, 8, 0.6);",
+    AlertState.URGENT: "box-shadow: 0 0 30px rgba(239, 68, 68, 0.8);",
+}
+_MUTED_GLOW_STYLE = "box-shadow: 0 0 30px rgba(30, 58, 95, 0.5);"
+
+# CSS classes that animate the light for each alerting state
+_ANIMATION_CLASSES = {
+    AlertState.CHAT: "alert-pulse",
+    AlertState.URGENT: "alert-flash",
+}
+
+
+def _light_styles() -> dict[AlertState | None, str]:
+    """Build the light's background style for each state from config.
+
+    The None key holds the muted style.
+    """
+    return {
+        AlertState.IDLE: f"background-color: {config.color_idle}",
+        AlertState.CHAT: f"background-color: {config.color_chat}",
+        AlertState.URGENT: f"background-color: {config.color_urgent}",
+        None: f"background-color: {config.color_muted}",
+    }
+
+
+def _animation_css() -> str:
+    """Build the keyframe animations that blink the light.
+
+    Each cycle shows the light on, then off (dark gray, faint shadow), for
+    config.pulse_speed or config.flash_speed seconds each, so the browser
+    animates the light without any per-frame work in Python.
+    """
+    return f"""
+        @keyframes alert-blink {{
+            50%, 100% {{
+                background-color: #374151;
+                box-shadow: 0 0 5px rgba(0,0,0,0.3);
+            }}
+        }}
+        .alert-pulse {{
+            animation: alert-blink {config.pulse_speed * 2}s step-end infinite;
+        }}
+        .alert-flash {{
+            animation: alert-blink {config.flash_speed * 2}s step-end infinite;
+        }}
+    """
+
+
 class AlertWindow:
     """Alert light window using NiceGUI."""
 
@@ -31,17 +94,24 @@ class AlertWindow:
         self._count_label = None
         self._status_label = None
         self._mute_button = None
-        self._animation_task: asyncio.Task | None = None
-        self._light_on = True
         self._muted = config.muted
+        # Per-state light styles, resolved from config (again on each build())
+        self._light_styles = _light_styles()
+        # Last light style, (state, muted) glow key and animation class rendered
+        self._last_light_style: str | None = None
+        self._last_glow_key: tuple | None = None
+        self._last_animation: str | None = None
 
         # Callbacks for external events
-        self._on_reset_callbacks: list = []
-        self._on_mute_callbacks: list = []
+        self._on_reset: Callable[[], None] | None = None
+        self._on_mute: Callable[[bool], None] | None = None
 
-        # Thread-safe notification queue for cross-thread communication
-        self._notification_queue: queue.Queue = queue.Queue()
-        self._queue_processor_started = False
+        # Event loop the UI runs on, captured in build(). Notifications from
+        # other threads are handed to it with call_soon_threadsafe; any that
+        # arrive before the first build() are held until then.
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending_notifications: list[Callable[[], None]] = []
+        self._loop_lock = threading.Lock()
 
     @property
     def state(self) -> AlertState:
@@ -58,45 +128,59 @@ class AlertWindow:
         """Whether the app is muted."""
         return self._muted
 
-    def on_reset(self, callback) -> None:
-        """Register a callback for when reset is clicked.
+    def on_reset(self, callback: Callable[[], None]) -> None:
+        """Register the callback for when reset is clicked.
 
-        Clears any existing callbacks first to prevent duplicate calls.
+        Replaces any existing callback to prevent duplicate calls.
         """
-        self._on_reset_callbacks.clear()
-        self._on_reset_callbacks.append(callback)
+        self._on_reset = callback
 
-    def on_mute(self, callback) -> None:
-        """Register a callback for when mute is toggled.
+    def on_mute(self, callback: Callable[[bool], None]) -> None:
+        """Register the callback for when mute is toggled.
 
-        Clears any existing callbacks first to prevent duplicate calls.
+        Replaces any existing callback to prevent duplicate calls.
         """
-        self._on_mute_callbacks.clear()
-        self._on_mute_callbacks.append(callback)
+        self._on_mute = callback
 
     def notify_chat(self) -> None:
         """Register a new chat notification (thread-safe)."""
-        # Queue the notification for processing in the main thread
-        self._notification_queue.put(("chat", None))
+        self._schedule(self._process_chat)
 
     def notify_urgent(self) -> None:
         """Register a new urgent notification (thread-safe)."""
-        # Queue the notification for processing in the main thread
-        self._notification_queue.put(("urgent", None))
+        self._schedule(self._process_urgent)
+
+    def _schedule(self, process: Callable[[], None]) -> None:
+        """Run a notification handler on the UI event loop."""
+        with self._loop_lock:
+            loop = self._loop
+            if loop is None:
+                self._pending_notifications.append(process)
+                return
+        try:
+            loop.call_soon_threadsafe(process)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            logger.debug("Event loop closed, dropping notification")
+
+    def _attach_loop(self) -> None:
+        """Capture the running event loop and flush held notifications."""
+        with self._loop_lock:
+            self._loop = asyncio.get_running_loop()
+            pending, self._pending_notifications = self._pending_notifications, []
+        for process in pending:
+            self._loop.call_soon(process)
 
     def _process_chat(self) -> None:
         """Process a chat notification (must be called from main thread)."""
         self._chat_count += 1
-        # Only upgrade to CHAT if not already in URGENT state
-        if self._state == AlertState.IDLE:
-            self._set_state(AlertState.CHAT)
+        self._set_state(_NEXT_STATE[self._state, AlertState.CHAT])
         self._update_display()
 
     def _process_urgent(self) -> None:
         """Process an urgent notification (must be called from main thread)."""
         self._urgent_count += 1
-        # URGENT always takes priority
-        self._set_state(AlertState.URGENT)
+        self._set_state(_NEXT_STATE[self._state, AlertState.URGENT])
         self._update_display()
 
     def reset(self) -> None:
@@ -106,10 +190,10 @@ class AlertWindow:
         self._set_state(AlertState.IDLE)
         self._update_display()
 
-        # Trigger callbacks
-        for callback in self._on_reset_callbacks:
+        # Trigger callback
+        if self._on_reset is not None:
             try:
-                callback()
+                self._on_reset()
             except Exception as e:
                 logger.error(f"Reset callback error: {e}")
 
@@ -120,10 +204,10 @@ class AlertWindow:
         self._update_display()
         self._update_mute_button()
 
-        # Trigger callbacks
-        for callback in self._on_mute_callbacks:
+        # Trigger callback
+        if self._on_mute is not None:
             try:
-                callback(self._muted)
+                self._on_mute(self._muted)
             except Exception as e:
                 logger.error(f"Mute callback error: {e}")
 
@@ -136,79 +220,65 @@ class AlertWindow:
                 self._mute_button.set_text("Mute")
 
     def _set_state(self, state: AlertState) -> None:
-        """Set the alert state and update animation."""
+        """Set the alert state and update the light and its animation."""
         if self._state == state:
             return
 
         self._state = state
-        self._start_animation()
-
-    def _start_animation(self) -> None:
-        """Start the appropriate animation for current state."""
-        # Cancel existing animation
-        if self._animation_task and not self._animation_task.done():
-            self._animation_task.cancel()
-
-        if self._state == AlertState.IDLE:
-            # No animation, solid color
-            self._light_on = True
-            self._update_light_color()
-        elif self._state == AlertState.CHAT:
-            # Pulsing animation
-            try:
-                self._animation_task = asyncio.create_task(self._pulse_animation())
-            except RuntimeError:
-                # No event loop running (e.g., in tests)
-                self._light_on = True
-                self._update_light_color()
-        elif self._state == AlertState.URGENT:
-            # Flashing animation
-            try:
-                self._animation_task = asyncio.create_task(self._flash_animation())
-            except RuntimeError:
-                # No event loop running (e.g., in tests)
-                self._light_on = True
-                self._update_light_color()
-
-    async def _pulse_animation(self) -> None:
-        """Slow pulsing animation for chat notifications."""
-        try:
-            while self._state == AlertState.CHAT:
-                self._light_on = not self._light_on
-                self._update_light_color()
-                await asyncio.sleep(config.pulse_speed)
-        except asyncio.CancelledError:
-            pass
-
-    async def _flash_animation(self) -> None:
-        """Fast flashing animation for urgent notifications."""
-        try:
-            while self._state == AlertState.URGENT:
-                self._light_on = not self._light_on
-                self._update_light_color()
-                await asyncio.sleep(config.flash_speed)
-        except asyncio.CancelledError:
-            pass
+        self._update_light_color()
 
     def _update_light_color(self) -> None:
-        """Update the light element color."""
+        """Update the light element color, glow and animation."""
+        if not self._light_element:
+            return
+
+        # Dark blue when muted
+        style = self._light_styles[None if self._muted else self._state]
+
+        # Restyling parses the CSS string even when nothing changed, so only
+        # do it when the color actually flips
+        if style != self._last_light_style:
+            self._last_light_style = style
+            self._light_element.style(style)
+        self._update_glow()
+        self._update_animation()
+
+    def _update_glow(self) -> None:
+        """Update the glow effect around the light.
+
+        Called with every light color update; the style is only pushed to the
+        browser when the state or mute setting actually changed.
+        """
         if not self._light_element:
             return
 
+        glow_key = (self._state, self._muted)
+        if glow_key == self._last_glow_key:
+            return
+        self._last_glow_key = glow_key
+
+        if self._muted:
+            self._light_element.style(_MUTED_GLOW_STYLE)
+        else:
+            self._light_element.style(_GLOW_STYLES[self._state])
+
+    def _update_animation(self) -> None:
+        """Apply the CSS animation class for the current state.
+
+        Pulsing (chat) and flashing (urgent) run as CSS keyframe animations in
+        the browser; the light is solid when idle or muted.
+        """
         if self._muted:
-            color = config.color_muted  # Dark blue when muted
-        elif not self._light_on:
-            color = "#374151"  # Dark gray (off)
-        elif self._state == AlertState.IDLE:
-            color = config.color_idle
-        elif self._state == AlertState.CHAT:
-            color = config.color_chat
-        elif self._state == AlertState.URGENT:
-            color = config.color_urgent
+            animation = None
         else:
-            color = config.color_idle
+            animation = _ANIMATION_CLASSES.get(self._state)
+        if animation == self._last_animation:
+            return
+        self._last_animation = animation
 
-        self._light_element.style(f"background-color: {color}")
+        self._light_element.classes(
+            remove=" ".join(_ANIMATION_CLASSES.values()), add=animation
+        )
 
     def _update_display(self) -> None:
         """Update the display elements."""
@@ -230,6 +300,8 @@ class AlertWindow:
 
     def build(self) -> None:
         """Build the NiceGUI interface."""
+        ui.add_css(_animation_css())
+
         # Configure the page - set dark background on html and body to eliminate white borders
         ui.query("html").style("background-color: #1f2937;")
         ui.query("body").style(
@@ -282,66 +354,16 @@ class AlertWindow:
                 "dense size=sm color=grey-8"
             )
 
-        # Update glow effect based on state
-        self._setup_glow_updates()
-
-    def _setup_glow_updates(self) -> None:
-        """Set up dynamic glow effect updates."""
-
-        async def update_glow():
-            while True:
-                if self._light_element:
-                    if self._muted:
-                        glow_color = "rgba(30, 58, 95, 0.5)"  # Dark blue glow
-                    elif self._state == AlertState.IDLE:
-                        glow_color = "rgba(34, 197, 94, 0.5)"
-                    elif self._state == AlertState.CHAT:
-                        glow_color = "rgba(234, 179, 8, 0.6)"
-                    elif self._state == AlertState.URGENT:
-                        glow_color = "rgba(239, 68, 68, 0.8)"
-                    else:
-                        glow_color = "rgba(34, 197, 94, 0.5)"
-
-                    if self._muted or self._light_on:
-                        self._light_element.style(f"box-shadow: 0 0 30px {glow_color};")
-                    else:
-                        self._light_element.style(
-                            "box-shadow: 0 0 5px rgba(0,0,0,0.3);"
-                        )
-
-                await asyncio.sleep(0.1)
-
-        asyncio.create_task(update_glow())
-
-        # Start the notification queue processor
-        self._start_queue_processor()
-
-    def _start_queue_processor(self) -> None:
-        """Start processing the notification queue in the main event loop."""
-        if self._queue_processor_started:
-            return
-        self._queue_processor_started = True
-
-        async def process_queue():
-            """Process notifications from the queue."""
-            while True:
-                try:
-                    # Check for queued notifications
-                    while not self._notification_queue.empty():
-                        try:
-                            notification_type, _ = self._notification_queue.get_nowait()
-                            if notification_type == "chat":
-                                self._process_chat()
-                            elif notification_type == "urgent":
-                                self._process_urgent()
-                        except queue.Empty:
-                            break
-                except Exception as e:
-                    logger.error(f"Error processing notification queue: {e}")
-
-                await asyncio.sleep(0.1)  # Check queue 10 times per second
-
-        asyncio.create_task(process_queue())
+        # Apply the color, glow and animation for the current state to the
+        # new light
+        self._light_styles = _light_styles()
+        self._last_light_style = None
+        self._last_glow_key = None
+        self._last_animation = None
+        self._update_light_color()
+
+        # Deliver notifications on this event loop from now on
+        self._attach_loop()
 
 
 # Global alert window instance
@@ -1,5 +1,6 @@
 """macOS Menu Bar integration using rumps."""
 
+import asyncio
 import logging
 import threading
 import webbrowser
@@ -20,7 +21,9 @@ class TeamsMenuBar(rumps.App):
     ICON_CHAT = "🟡"
     ICON_URGENT = "🔴"
 
-    def __init__(self, port: int = 8080):
+    def __init__(
+        self, port: int = 8080, ui_loop: asyncio.AbstractEventLoop | None = None
+    ):
         super().__init__(
             name="Teams Alert",
             title=self.ICON_IDLE,
@@ -28,6 +31,8 @@ class TeamsMenuBar(rumps.App):
         )
 
         self._port = port
+        # NiceGUI's event loop; menu callbacks that touch UI state run there
+        self._ui_loop = ui_loop
         self._notification_count = 0
         self._show_window_callback: Callable | None = None
         self._quit_callback: Callable | None = None
@@ -93,9 +98,16 @@ class TeamsMenuBar(rumps.App):
     def _reset_alerts(self, sender) -> None:
         """Reset all alerts."""
         if hasattr(self, "_reset_callback") and self._reset_callback:
-            self._reset_callback()
+            self._run_on_ui_loop(self._reset_callback)
         self.update_status("idle", 0)
 
+    def _run_on_ui_loop(self, callback: Callable) -> None:
+        """Run a callback on the UI event loop, or directly if there is none."""
+        if self._ui_loop is None:
+            callback()
+            return
+        self._ui_loop.call_soon_threadsafe(callback)
+
     def _toggle_sound(self, sender) -> None:
         """Toggle sound on/off."""
         sender.state = not sender.state
@@ -116,23 +128,40 @@ class MenuBarManager:
         self._thread: threading.Thread | None = None
         self._port = port
 
-    def start(self) -> TeamsMenuBar:
-        """Start the menu bar app in a background thread."""
-        self._app = TeamsMenuBar(port=self._port)
+    def start(self, ui_loop: asyncio.AbstractEventLoop | None = None) -> TeamsMenuBar:
+        """Start the menu bar app in a background thread.
+
+        Args:
+            ui_loop: NiceGUI's event loop. When given, menu actions that
+                     change UI state are scheduled on it thread-safely.
 
-        def run():
-            self._app.run()
+        Returns:
+            The running menu bar app.
+        """
+        self._app = TeamsMenuBar(port=self._port, ui_loop=ui_loop)
 
-        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread = threading.Thread(
+            target=self._app.run, name="menu-bar", daemon=True
+        )
         self._thread.start()
 
         return self._app
 
-    def stop(self) -> None:
-        """Stop the menu bar app."""
+    def stop(self, timeout: float = 2.0) -> None:
+        """Stop the menu bar app and wait for its run loop to exit.
+
+        Args:
+            timeout: Seconds to wait for the menu bar thread to finish.
+        """
         if self._app:
             rumps.quit_application()
 
+        if self._thread:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                logger.warning("Menu bar thread did not stop in time")
+            self._thread = None
+
     @property
     def app(self) -> TeamsMenuBar | None:
         """Get the menu bar app instance."""
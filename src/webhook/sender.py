@@ -1,16 +1,65 @@
 """Webhook sender for Teams notifications."""
 
 import asyncio
+import json
 import logging
+import queue
+import random
+import threading
 from datetime import datetime, timezone
 from typing import Any, Optional
-import threading
 
 import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from yarl import URL
 
 logger = logging.getLogger(__name__)
 
+# Maximum webhook sends waiting for the background worker; when full, the
+# oldest pending send is dropped in favor of the newest
+SEND_QUEUE_SIZE = 32
+
+# Async sends retry 5xx responses, 429 and timeouts on the same session, with
+# exponential backoff plus jitter between attempts
+MAX_RETRIES = 2
+RETRY_BACKOFF_SECONDS = 0.05
+# Upper bound for a server-provided Retry-After, so a stale alert isn't held
+RETRY_AFTER_MAX_SECONDS = 5.0
+# Bytes of an error response body included in the warning log
+ERROR_BODY_SNIPPET_SIZE = 512
+
+
+def _utc_timestamp() -> str:
+    """Current UTC time as an ISO 8601 string with a Z suffix."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retrying a failed send.
+
+    Args:
+        attempt: Zero-based number of the attempt that failed.
+        retry_after: The response's Retry-After header, if any. Only the
+                     delay-seconds form is honored.
+
+    Returns:
+        The server's Retry-After (capped) if given, otherwise exponential
+        backoff with jitter.
+    """
+    if retry_after is not None:
+        try:
+            return min(max(float(retry_after), 0.0), RETRY_AFTER_MAX_SECONDS)
+        except ValueError:
+            pass
+    return RETRY_BACKOFF_SECONDS * (2**attempt + random.random())
+
+
+def _encode_payload(payload: dict[str, Any]) -> bytes:
+    """Serialize a payload to compact JSON bytes for the request body."""
+    return json.dumps(payload, separators=(",", ":")).encode()
+
 
 class WebhookSender:
     """Sends notification events to a configured webhook."""
@@ -34,13 +83,54 @@ class WebhookSender:
             bearer_token: Optional bearer token for Authorization header.
         """
         self.webhook_url = webhook_url
+        # Parsed once for aiohttp instead of on every post
+        self._url = URL(webhook_url) if webhook_url else None
         self._bearer_token = bearer_token
         self._payloads = {
             "message": payload_message,
             "urgent": payload_urgent,
             "clear": payload_clear,
         }
+        # Custom payloads never change, so serialize them once up front
+        self._payload_bytes = {
+            notification_type: _encode_payload(payload)
+            for notification_type, payload in self._payloads.items()
+            if payload is not None
+        }
+        # Headers are fixed for the sender's lifetime; built once and shared
+        # by every request
+        self._headers = self._get_headers()
         self._session: Optional[aiohttp.ClientSession] = None
+        # Event loop for sends from other threads, see bind_loop()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._send_tasks: set[asyncio.Future] = set()
+
+        # Long-lived requests session so the worker reuses its connection to
+        # the webhook host instead of a new TCP/TLS handshake per send. Only the
+        # send worker uses it.
+        self._requests_session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=2,
+            pool_maxsize=4,
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.2,
+                status_forcelist=[502, 503, 504],
+                allowed_methods=frozenset({"POST"}),
+                raise_on_status=False,
+            ),
+        )
+        self._requests_session.mount("https://", adapter)
+        self._requests_session.mount("http://", adapter)
+
+        # Background worker for sends from threads without an event loop, so a
+        # slow webhook never blocks the caller (e.g. the log stream monitor).
+        # Started on the first queued send; close() stops it by queueing None.
+        self._send_queue: queue.Queue[Optional[str]] = queue.Queue(
+            maxsize=SEND_QUEUE_SIZE
+        )
+        self._send_worker: Optional[threading.Thread] = None
+        self._send_worker_lock = threading.Lock()
 
     @property
     def enabled(self) -> bool:
@@ -64,10 +154,30 @@ class WebhookSender:
                 sanitized["Authorization"] = f"Bearer {auth[7:17]}..."
         return sanitized
 
+    def _log_request(self, payload: bytes) -> None:
+        """Debug log the request details."""
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug("Webhook URL: %s", self.webhook_url)
+        logger.debug("Webhook headers: %s", self._sanitize_headers(self._headers))
+        logger.debug("Webhook payload: %s", payload.decode())
+
     async def _get_session(self) -> aiohttp.ClientSession:
-        """Get or create the aiohttp session."""
+        """Get or create the aiohttp session.
+
+        The session is reused for every send, so its connection to the webhook
+        host (and the DNS lookup) is kept alive between notifications.
+        """
         if self._session is None or self._session.closed:
-            self._session = aiohttp.ClientSession()
+            connector = aiohttp.TCPConnector(
+                limit_per_host=4,
+                ttl_dns_cache=300,
+                keepalive_timeout=75,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=10, connect=3),
+            )
         return self._session
 
     def _get_payload(self, notification_type: str) -> dict[str, Any]:
@@ -86,10 +196,21 @@ class WebhookSender:
         # Default payload if no custom payload is configured
         return {
             "type": notification_type,
-            "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+            "timestamp": _utc_timestamp(),
             "source": "teams-notifier",
         }
 
+    def _get_payload_bytes(self, notification_type: str) -> bytes:
+        """Get the serialized request body for a notification type.
+
+        Custom payloads are served from the pre-serialized cache; the default
+        payload contains a timestamp and is serialized per call.
+        """
+        payload_bytes = self._payload_bytes.get(notification_type)
+        if payload_bytes is not None:
+            return payload_bytes
+        return _encode_payload(self._get_payload(notification_type))
+
     async def send_notification(self, notification_type: str) -> bool:
         """Send a notification to the webhook.
 
@@ -103,37 +224,47 @@ class WebhookSender:
             logger.debug("Webhook not configured, skipping")
             return False
 
-        payload = self._get_payload(notification_type)
+        payload = self._get_payload_bytes(notification_type)
+        self._log_request(payload)
 
-        try:
-            session = await self._get_session()
-            headers = self._get_headers()
-
-            # Debug log the request details
-            logger.debug(f"Webhook URL: {self.webhook_url}")
-            logger.debug(f"Webhook headers: {self._sanitize_headers(headers)}")
-            logger.debug(f"Webhook payload: {payload}")
-
-            async with session.post(
-                self.webhook_url,
-                json=payload,
-                headers=headers,
-                timeout=aiohttp.ClientTimeout(total=10),
-            ) as response:
-                if response.status < 300:
-                    logger.info(f"Webhook sent successfully: {notification_type}")
-                    return True
-                else:
-                    logger.warning(
-                        f"Webhook returned status {response.status}: {await response.text()}"
-                    )
+        for attempt in range(MAX_RETRIES + 1):
+            retry_after = None
+            try:
+                session = await self._get_session()
+                async with session.post(
+                    self._url,
+                    data=payload,
+                    headers=self._headers,
+                ) as response:
+                    status = response.status
+                    if status < 300:
+                        logger.info("Webhook sent successfully: %s", notification_type)
+                        return True
+                    if (status != 429 and status < 500) or attempt == MAX_RETRIES:
+                        # Read only the start of the body; error pages can be
+                        # large HTML documents
+                        snippet = await response.content.read(ERROR_BODY_SNIPPET_SIZE)
+                        logger.warning(
+                            "Webhook returned status %s: %s",
+                            status,
+                            snippet.decode("utf-8", "replace"),
+                        )
+                        return False
+                    if status == 429:
+                        retry_after = response.headers.get("Retry-After")
+                    logger.info("Webhook returned status %s, retrying", status)
+            except TimeoutError:
+                if attempt == MAX_RETRIES:
+                    logger.warning("Webhook request timed out")
                     return False
-        except asyncio.TimeoutError:
-            logger.warning("Webhook request timed out")
-            return False
-        except Exception as e:
-            logger.error(f"Failed to send webhook: {e}")
-            return False
+                logger.info("Webhook request timed out, retrying")
+            except Exception as e:
+                logger.error("Failed to send webhook: %s", e)
+                return False
+
+            await asyncio.sleep(_retry_delay(attempt, retry_after))
+
+        return False
 
     def _send_sync_request(self, notification_type: str) -> bool:
         """Send webhook using synchronous requests library.
@@ -141,31 +272,36 @@ class WebhookSender:
         This is used when called from a background thread where asyncio
         event loops may not be available or may conflict with the main loop.
         """
-        payload = self._get_payload(notification_type)
-        headers = self._get_headers()
-
-        # Debug log the request details
-        logger.debug(f"Webhook URL: {self.webhook_url}")
-        logger.debug(f"Webhook headers: {self._sanitize_headers(headers)}")
-        logger.debug(f"Webhook payload: {payload}")
+        payload = self._get_payload_bytes(notification_type)
+        headers = self._headers
+        self._log_request(payload)
 
         try:
-            response = requests.post(
-                self.webhook_url, json=payload, headers=headers, timeout=10
-            )
-            if response.status_code < 300:
-                logger.info(f"Webhook sent successfully: {notification_type}")
-                return True
-            else:
+            # Streamed, so an error body isn't downloaded before it is logged
+            with self._requests_session.post(
+                self.webhook_url, data=payload, headers=headers, timeout=10, stream=True
+            ) as response:
+                if response.status_code < 300:
+                    # Consume the body so the connection goes back to the pool
+                    _ = response.content
+                    logger.info("Webhook sent successfully: %s", notification_type)
+                    return True
+                # Read only the start of the body; error pages can be large
+                # HTML documents
+                snippet = response.raw.read(
+                    ERROR_BODY_SNIPPET_SIZE, decode_content=True
+                )
                 logger.warning(
-                    f"Webhook returned status {response.status_code}: {response.text}"
+                    "Webhook returned status %s: %s",
+                    response.status_code,
+                    snippet.decode("utf-8", "replace"),
                 )
                 return False
         except requests.Timeout:
             logger.warning("Webhook request timed out")
             return False
         except Exception as e:
-            logger.error(f"Failed to send webhook: {e}")
+            logger.error("Failed to send webhook: %s", e)
             return False
 
     def send_notification_sync(self, notification_type: str) -> None:
@@ -182,22 +318,113 @@ class WebhookSender:
             try:
                 asyncio.get_running_loop()
                 # We're in the main thread with an async context, schedule the task
-                asyncio.create_task(self.send_notification(notification_type))
-                logger.debug(f"Scheduled webhook task for: {notification_type}")
+                self._schedule_send(notification_type)
                 return
             except RuntimeError:
                 # No running loop in main thread
                 pass
 
-        # We're in a background thread or no event loop - use sync requests
-        # Run in a separate thread to avoid blocking
-        thread = threading.Thread(
-            target=self._send_sync_request, args=(notification_type,), daemon=True
-        )
-        thread.start()
+        # From other threads, hand the send to the bound event loop so it
+        # shares the aiohttp session's keep-alive connection
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                loop.call_soon_threadsafe(self._schedule_send, notification_type)
+                return
+            except RuntimeError:
+                # Loop closed in the meantime
+                pass
+
+        # No event loop available - hand off to the worker thread, which
+        # sends with sync requests
+        self._enqueue_send(notification_type)
+
+    def bind_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind the application's event loop for sends from other threads.
+
+        Args:
+            loop: The running event loop that should perform webhook sends.
+        """
+        self._loop = loop
+
+    def _schedule_send(self, notification_type: str) -> None:
+        """Schedule an async send on the running loop (call on the loop)."""
+        task = asyncio.ensure_future(self.send_notification(notification_type))
+        # Keep a reference so the fire-and-forget task isn't garbage collected
+        self._send_tasks.add(task)
+        task.add_done_callback(self._send_tasks.discard)
+        logger.debug("Scheduled webhook task for: %s", notification_type)
+
+    def _enqueue_send(self, notification_type: str) -> None:
+        """Queue a send for the worker, dropping the oldest pending one if full."""
+        self._start_send_worker()
+        try:
+            self._send_queue.put_nowait(notification_type)
+            return
+        except queue.Full:
+            pass
+
+        try:
+            dropped = self._send_queue.get_nowait()
+            logger.warning("Webhook queue full, dropping pending: %s", dropped)
+        except queue.Empty:
+            pass
+        try:
+            self._send_queue.put_nowait(notification_type)
+        except queue.Full:
+            logger.warning("Webhook queue full, dropping: %s", notification_type)
+
+    def _start_send_worker(self) -> None:
+        """Start the send worker if it isn't running yet."""
+        if self._send_worker is not None:
+            return
+        with self._send_worker_lock:
+            if self._send_worker is None:
+                self._send_worker = threading.Thread(
+                    target=self._send_loop, daemon=True
+                )
+                self._send_worker.start()
+
+    def _send_loop(self) -> None:
+        """Send queued notifications until None is queued (runs on the worker).
+
+        Sends that queued up while the previous request was in flight are
+        drained as a batch, and consecutive duplicates in the batch are sent
+        only once.
+        """
+        while True:
+            batch = [self._send_queue.get()]
+            while True:
+                try:
+                    notification_type = self._send_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if notification_type != batch[-1]:
+                    batch.append(notification_type)
+                else:
+                    logger.debug(
+                        "Collapsed repeated queued webhook send: %s", notification_type
+                    )
+
+            for notification_type in batch:
+                if notification_type is None:
+                    return
+                self._send_sync_request(notification_type)
+
+    def _stop_send_worker(self, worker: threading.Thread) -> None:
+        """Stop the send worker after it has sent what is already queued."""
+        self._send_queue.put(None)
+        worker.join()
 
     async def close(self) -> None:
-        """Close the aiohttp session."""
+        """Stop the send worker and close the HTTP sessions."""
+        with self._send_worker_lock:
+            worker = self._send_worker
+            self._send_worker = None
+        if worker is not None:
+            # Joining waits for in-flight sync requests, so keep it off the loop
+            await asyncio.to_thread(self._stop_send_worker, worker)
+        self._requests_session.close()
         if self._session and not self._session.closed:
             await self._session.close()
             self._session = None
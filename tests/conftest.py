@@ -0,0 +1,38 @@
+"""Shared pytest fixtures."""
+
+import asyncio
+
+import pytest
+
+from src.config import config
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _no_audio_preload():
+    """Keep SoundPlayer from loading sounds into AVAudioPlayer.
+
+    No test plays real audio, so opening the audio device for every
+    SoundPlayer on macOS is wasted setup. Tests that need a pool set one up.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr("src.audio.sound_player.AVAudioPlayer", None)
+        yield
+
+
+@pytest.fixture
+def sound_state(monkeypatch):
+    """Config with sound enabled and unmuted, restored after the test."""
+    monkeypatch.setattr(config, "sound_enabled", True)
+    monkeypatch.setattr(config, "muted", False)
+    return config
+
+
+@pytest.fixture(scope="session")
+def loop():
+    """One event loop shared by the tests that run coroutines."""
+    loop = asyncio.new_event_loop()
+    # PYTHONASYNCIODEBUG or -X dev would otherwise turn on debug mode, which
+    # captures a stack trace for every task and handle the mocked sends create
+    loop.set_debug(False)
+    yield loop
+    loop.close()
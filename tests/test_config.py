@@ -3,7 +3,13 @@
 import os
 from unittest.mock import patch
 
-from src.config import _get_log_level, _get_webhook_bearer
+from src.config import (
+    Config,
+    _compile_sound_patterns,
+    _find_and_load_dotenv,
+    _get_log_level,
+    _get_webhook_bearer,
+)
 
 
 class TestLogLevel:
@@ -83,3 +89,76 @@ class TestWebhookBearer:
         with patch.dict(os.environ, {"WEBHOOK_BEARER": "my-secret-token"}):
             token = _get_webhook_bearer()
             assert token == "my-secret-token"
+
+
+class TestDotenvDiscovery:
+    """Tests for .env file discovery."""
+
+    def test_explicit_env_file(self, tmp_path):
+        """Test TEAMS_NOTIFIER_ENV points at the .env file to load."""
+        env_file = tmp_path / "custom.env"
+        env_file.write_text("TEAMS_NOTIFIER_TEST_VALUE=loaded\n")
+
+        with patch.dict(os.environ, {"TEAMS_NOTIFIER_ENV": str(env_file)}):
+            assert _find_and_load_dotenv() == str(env_file)
+            assert os.environ["TEAMS_NOTIFIER_TEST_VALUE"] == "loaded"
+
+
+class TestConfigEnvSettings:
+    """Tests for environment-derived Config settings."""
+
+    def test_env_settings_read_at_construction(self):
+        """Test env settings reflect the environment when Config is created."""
+        with patch.dict(os.environ, {"WEBHOOK_URL": "https://example.com/hook"}):
+            cfg = Config()
+
+        with patch.dict(os.environ, {"WEBHOOK_URL": "https://example.com/other"}):
+            assert cfg.webhook_url == "https://example.com/hook"
+
+    def test_env_settings_can_be_passed_to_constructor(self):
+        """Test explicit constructor values are used instead of the environment."""
+        with patch.dict(
+            os.environ,
+            {"LOG_LEVEL": "ERROR", "WEBHOOK_URL": "https://example.com/env"},
+        ):
+            cfg = Config(
+                log_level="DEBUG",
+                webhook_url="https://example.com/hook",
+                urgent_sound_patterns=["mention"],
+            )
+            assert cfg.log_level == "DEBUG"
+            assert cfg.webhook_url == "https://example.com/hook"
+            assert cfg.urgent_sound_patterns == ["mention"]
+
+    def test_env_settings_can_be_overridden(self):
+        """Test env settings can still be assigned like plain attributes."""
+        cfg = Config(urgent_sound_patterns=["urgent"])
+        assert cfg.urgent_sound_regex.search("b2_teams_urgent_notification")
+
+        cfg.urgent_sound_patterns = ["mention"]
+        assert cfg.urgent_sound_patterns == ["mention"]
+        assert cfg.urgent_sound_regex.search("teams_mention_sound")
+        assert cfg.urgent_sound_regex.search("b2_teams_urgent_notification") is None
+
+
+class TestSoundPatternRegex:
+    """Tests for compiled sound pattern matching."""
+
+    def test_matches_any_pattern_case_insensitive(self):
+        """Test the compiled regex matches any pattern regardless of case."""
+        regex = _compile_sound_patterns(("urgent", "alarm"))
+        assert regex.search("b2_teams_URGENT_notification")
+        assert regex.search("b4_teams_notification_r4_alarm")
+        assert regex.search("a8_teams_basic_notification_r4_ping") is None
+
+    def test_patterns_are_literal(self):
+        """Test regex metacharacters in patterns are matched literally."""
+        regex = _compile_sound_patterns(("a.b",))
+        assert regex.search("xa.by")
+        assert regex.search("xaxby") is None
+
+    def test_empty_patterns_never_match(self):
+        """Test an empty pattern tuple matches nothing."""
+        regex = _compile_sound_patterns(())
+        assert regex.search("anything") is None
+        assert regex.search("") is None
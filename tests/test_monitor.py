@@ -1,7 +1,12 @@
 """Tests for the log stream notification monitor."""
 
-from unittest.mock import MagicMock
+import subprocess
+import threading
+import time
 from datetime import datetime
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
 
 from src.monitors.log_stream_monitor import (
     LogStreamMonitor,
@@ -9,37 +14,36 @@ from src.monitors.log_stream_monitor import (
     TeamsNotification,
 )
 
+# Fixed notification time; no test depends on the current clock
+TIMESTAMP = datetime(2024, 1, 1, 9, 30)
 
-class TestLogStreamMonitor:
-    """Tests for LogStreamMonitor class."""
-
-    def test_notification_pattern_matches_teams2(self):
-        """Test that the pattern matches Teams notification log lines."""
-        monitor = LogStreamMonitor()
-
-        log_line = (
-            'Queuing action present for app com.microsoft.teams2 items: ["761F-2077"]'
-        )
-
-        assert monitor.NOTIFICATION_PATTERN.search(log_line) is not None
-
-    def test_notification_pattern_matches_classic_teams(self):
-        """Test that the pattern matches classic Teams notification log lines."""
-        monitor = LogStreamMonitor()
+# Log stream lines for a Teams notification and its urgent sound
+NOTIFICATION_LINE = 'Queuing action present for app com.microsoft.teams2 items: ["A-1"]'
+URGENT_SOUND_LINE = (
+    "Playing notification sound "
+    "{ nam: b2_teams_urgent_notification_r4_prioritize } for com.microsoft.teams2"
+)
 
-        log_line = (
-            'Queuing action present for app com.microsoft.teams items: ["ABC-123"]'
-        )
 
-        assert monitor.NOTIFICATION_PATTERN.search(log_line) is not None
+class TestLogStreamMonitor:
+    """Tests for LogStreamMonitor class."""
 
-    def test_notification_pattern_ignores_other_apps(self):
-        """Test that the pattern ignores non-Teams apps."""
+    @pytest.mark.parametrize(
+        ("bundle_id", "matches"),
+        [
+            ("com.microsoft.teams2", True),
+            ("com.microsoft.teams", True),  # Classic Teams
+            ("com.apple.mail", False),
+            ("COM.MICROSOFT.TEAMS2", False),  # Case-sensitive, like the prefilter
+        ],
+    )
+    def test_notification_pattern(self, bundle_id, matches):
+        """Test that the pattern matches Teams notification lines only."""
         monitor = LogStreamMonitor()
 
-        log_line = 'Queuing action present for app com.apple.mail items: ["XYZ-789"]'
+        log_line = f'Queuing action present for app {bundle_id} items: ["761F-2077"]'
 
-        assert monitor.NOTIFICATION_PATTERN.search(log_line) is None
+        assert (monitor.NOTIFICATION_PATTERN.search(log_line) is not None) is matches
 
     def test_sound_pattern_matches(self):
         """Test that the sound pattern matches Teams notification sounds."""
@@ -83,37 +87,160 @@ class TestLogStreamMonitor:
                 f"Expected URGENT for {sound_name}"
             )
 
+    def test_classify_by_sound_is_memoized(self):
+        """Test that each sound name is only matched against the regex once."""
+        monitor = LogStreamMonitor()
+        sound_name = "b2_teams_urgent_notification_r4_prioritize"
+        regex = MagicMock(wraps=monitor._urgent_sound_regex)
+        monitor._urgent_sound_regex = regex
+
+        assert monitor._classify_by_sound(sound_name) == NotificationType.URGENT
+        assert monitor._classify_by_sound(sound_name) == NotificationType.URGENT
+        assert regex.search.call_count == 1
+
     def test_callback_registration(self):
         """Test callback registration and removal."""
         monitor = LogStreamMonitor()
-        callback = MagicMock()
+        callback = Mock()
+
+        notification = TeamsNotification(
+            type=NotificationType.CHAT,
+            timestamp=TIMESTAMP,
+        )
 
         monitor.add_callback(callback)
-        assert callback in monitor._callbacks
+        monitor._dispatch_notification(notification)
+        callback.assert_called_once_with(notification)
 
+        callback.reset_mock()
         monitor.remove_callback(callback)
-        assert callback not in monitor._callbacks
+        monitor._dispatch_notification(notification)
+        callback.assert_not_called()
+
+    def test_first_notification_is_dispatched_immediately(self):
+        """Test that a notification outside a window isn't delayed."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._process_log_line(NOTIFICATION_LINE)
+        callback.assert_called_once()
+        assert callback.call_args[0][0].type == NotificationType.CHAT
 
-    def test_debouncing(self):
-        """Test that duplicate notifications are debounced."""
+        # Nothing followed it, so the window ends without another dispatch
+        monitor._end_window()
+        callback.assert_called_once()
+        assert monitor._window_type is None
+
+    def test_duplicates_within_window_are_dropped(self):
+        """Test that a burst of duplicates is dispatched exactly once."""
         monitor = LogStreamMonitor()
-        monitor._debounce_seconds = 1.0
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        for _ in range(3):
+            monitor._process_log_line(NOTIFICATION_LINE)
+        monitor._end_window()
+
+        callback.assert_called_once()
+        assert callback.call_args[0][0].type == NotificationType.CHAT
+
+    def test_higher_priority_within_window_is_dispatched_once(self):
+        """Test that only a rise in priority is dispatched again in the window."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
 
-        # First notification should process
-        assert monitor._should_process_notification() is True
+        monitor._queue_notification(NotificationType.CHAT, "chat")
+        monitor._queue_notification(NotificationType.CHAT, "chat")
+        monitor._queue_notification(NotificationType.URGENT, "urgent")
+        monitor._queue_notification(NotificationType.URGENT, "urgent")
+        monitor._queue_notification(NotificationType.CHAT, "chat")
+        monitor._end_window()
+
+        assert [call[0][0].type for call in callback.call_args_list] == [
+            NotificationType.CHAT,
+            NotificationType.URGENT,
+        ]
+
+    def test_urgent_sound_after_notification_escalates(self):
+        """Test that an urgent sound inside the window escalates right away."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._process_log_line(NOTIFICATION_LINE)
+        monitor._process_log_line(URGENT_SOUND_LINE)
+        monitor._process_log_line(URGENT_SOUND_LINE)
+        monitor._end_window()
+
+        assert callback.call_count == 2
+        assert callback.call_args[0][0].type == NotificationType.URGENT
+        assert monitor._pending_notification_type is None
+
+    def test_urgent_sound_after_urgent_notification_is_not_repeated(self):
+        """Test that the sound of an already urgent dispatch adds nothing."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
 
-        # Immediate second notification should be debounced
-        assert monitor._should_process_notification() is False
+        monitor._queue_notification(NotificationType.URGENT, "urgent")
+        monitor._process_log_line(URGENT_SOUND_LINE)
+        monitor._end_window()
+
+        callback.assert_called_once()
+
+    def test_window_timer_ends_window(self):
+        """Test that a notification after the timer fires is dispatched again."""
+        monitor = LogStreamMonitor()
+        monitor._debounce_seconds = 0.01
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._queue_notification(NotificationType.CHAT, "chat")
+        timer = monitor._window_timer
+        timer.join(timeout=1)
+        assert monitor._window_type is None
+
+        monitor._queue_notification(NotificationType.CHAT, "chat")
+        assert callback.call_count == 2
+        monitor._end_window()
+
+    def test_raw_log_line_kept_only_for_debug(self):
+        """Test that the log line is attached only when debug logging is on."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._log_debug = False
+        monitor._queue_notification(NotificationType.CHAT, "line")
+        assert callback.call_args[0][0].raw_data is None
+        monitor._end_window()
+
+        monitor._log_debug = True
+        monitor._queue_notification(NotificationType.CHAT, "line")
+        assert callback.call_args[0][0].raw_data == {"log_line": "line"}
+        monitor._end_window()
+
+    def test_end_window_without_notification_does_nothing(self):
+        """Test that ending a window that was never opened dispatches nothing."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._end_window()
+
+        callback.assert_not_called()
 
     def test_dispatch_notification(self):
         """Test that notifications are dispatched to callbacks."""
         monitor = LogStreamMonitor()
-        callback = MagicMock()
+        callback = Mock()
         monitor.add_callback(callback)
 
         notification = TeamsNotification(
             type=NotificationType.CHAT,
-            timestamp=datetime.now(),
+            timestamp=TIMESTAMP,
         )
 
         monitor._dispatch_notification(notification)
@@ -124,15 +251,15 @@ class TestLogStreamMonitor:
         """Test that callback errors don't stop other callbacks."""
         monitor = LogStreamMonitor()
 
-        failing_callback = MagicMock(side_effect=Exception("Test error"))
-        working_callback = MagicMock()
+        failing_callback = Mock(side_effect=Exception("Test error"))
+        working_callback = Mock()
 
         monitor.add_callback(failing_callback)
         monitor.add_callback(working_callback)
 
         notification = TeamsNotification(
             type=NotificationType.CHAT,
-            timestamp=datetime.now(),
+            timestamp=TIMESTAMP,
         )
 
         # Should not raise, and should call both callbacks
@@ -144,26 +271,91 @@ class TestLogStreamMonitor:
     def test_process_sound_then_notification(self):
         """Test that sound line sets pending type for next notification."""
         monitor = LogStreamMonitor()
-        callback = MagicMock()
+        callback = Mock()
         monitor.add_callback(callback)
 
         # Process sound line first (urgent sound = URGENT type)
-        sound_line = "Playing notification sound { nam: b2_teams_urgent_notification_r4_prioritize } for com.microsoft.teams2"
-        monitor._process_log_line(sound_line)
+        monitor._process_log_line(URGENT_SOUND_LINE)
 
         assert monitor._pending_notification_type == NotificationType.URGENT
 
         # Then process notification line
-        notification_line = (
-            'Queuing action present for app com.microsoft.teams2 items: ["ABC-123"]'
-        )
-        monitor._process_log_line(notification_line)
+        monitor._process_log_line(NOTIFICATION_LINE)
 
         # Should have dispatched an URGENT notification
         callback.assert_called_once()
         notification = callback.call_args[0][0]
         assert notification.type == NotificationType.URGENT
 
+    def test_process_notification_without_sound_defaults_to_chat(self):
+        """Test that a notification line with no preceding sound is CHAT."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._process_log_line(NOTIFICATION_LINE)
+
+        callback.assert_called_once()
+        assert callback.call_args[0][0].type == NotificationType.CHAT
+
+    def test_process_ignores_non_teams_lines(self):
+        """Test that lines from other apps neither dispatch nor set a type."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        monitor._process_log_line(
+            "Playing notification sound { nam: urgent_alarm } for com.apple.mail"
+        )
+        monitor._process_log_line(
+            'Queuing action present for app com.apple.mail items: ["XYZ-789"]'
+        )
+
+        callback.assert_not_called()
+        assert monitor._pending_notification_type is None
+
+    def test_process_chunk_handles_partial_lines(self):
+        """Test that lines split across chunks are reassembled."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+
+        line = NOTIFICATION_LINE.encode() + b"\n"
+        pending = monitor._process_chunk(b"other line\n" + line[:20])
+        assert pending == line[:20]
+        callback.assert_not_called()
+
+        pending = monitor._process_chunk(pending + line[20:])
+        assert pending == b""
+        callback.assert_called_once()
+
+    def test_monitor_loop_exits_promptly_when_stopped(self):
+        """Test that the loop notices stop without waiting for log output."""
+        monitor = LogStreamMonitor()
+        callback = Mock()
+        monitor.add_callback(callback)
+        real_popen = subprocess.Popen
+
+        def fake_popen(cmd, **kwargs):
+            return real_popen(
+                ["sh", "-c", f"echo '{NOTIFICATION_LINE}'; exec sleep 5"], **kwargs
+            )
+
+        with patch(
+            "src.monitors.log_stream_monitor.subprocess.Popen",
+            side_effect=fake_popen,
+        ):
+            monitor._running = True
+            thread = threading.Thread(target=monitor._monitor_loop)
+            thread.start()
+            time.sleep(0.3)
+            # Stop the loop without terminating the process
+            monitor._running = False
+            thread.join(timeout=1)
+
+        assert not thread.is_alive()
+        callback.assert_called_once()
+
 
 class TestTeamsNotification:
     """Tests for TeamsNotification dataclass."""
@@ -172,7 +364,7 @@ class TestTeamsNotification:
         """Test creating a notification."""
         notification = TeamsNotification(
             type=NotificationType.CHAT,
-            timestamp=datetime.now(),
+            timestamp=TIMESTAMP,
         )
 
         assert notification.type == NotificationType.CHAT
@@ -183,12 +375,22 @@ class TestTeamsNotification:
         raw = {"log_line": "test data"}
         notification = TeamsNotification(
             type=NotificationType.URGENT,
-            timestamp=datetime.now(),
+            timestamp=TIMESTAMP,
             raw_data=raw,
         )
 
         assert notification.raw_data == raw
 
+    def test_notification_is_immutable(self):
+        """Test that notifications can't be modified after dispatch."""
+        notification = TeamsNotification(
+            type=NotificationType.CHAT,
+            timestamp=TIMESTAMP,
+        )
+
+        with pytest.raises(AttributeError):
+            notification.type = NotificationType.URGENT
+
 
 class TestNotificationType:
     """Tests for NotificationType enum."""
@@ -197,13 +399,11 @@ class TestNotificationType:
         """Test all expected types exist."""
         assert NotificationType.CHAT
         assert NotificationType.URGENT
-        assert NotificationType.UNKNOWN
 
     def test_types_unique(self):
         """Test types are unique."""
         types = [
             NotificationType.CHAT,
             NotificationType.URGENT,
-            NotificationType.UNKNOWN,
         ]
         assert len(types) == len(set(types))
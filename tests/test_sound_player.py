@@ -1,254 +1,313 @@
 """Tests for the sound player."""
 
-from unittest.mock import patch
+import os
+import queue
+from unittest.mock import MagicMock, Mock, patch
 
-from src.audio.sound_player import SoundPlayer
+import pytest
+
+from src.audio.sound_player import MAX_AFPLAY_PROCESSES, SoundPlayer
 from src.config import config
 
 
+@pytest.fixture(scope="module")
+def player():
+    """A SoundPlayer shared by tests that don't depend on construction state.
+
+    Construction resolves and preloads the sounds, so it is done once per
+    module. The afplay worker, if a test started it, is stopped at the end.
+    """
+    player = SoundPlayer()
+    player.enabled = True
+    yield player
+    player.close()
+
+
+@pytest.fixture
+def fresh_player(player, monkeypatch):
+    """The shared player with empty pools and play history for one test."""
+    monkeypatch.setattr(player, "_pool", {})
+    monkeypatch.setattr(player, "_pool_index", {})
+    monkeypatch.setattr(player, "_last_played", {})
+    monkeypatch.setattr(player, "_afplay_pids", [])
+    return player
+
+
+@pytest.fixture
+def mock_play(player, monkeypatch):
+    """Replace the shared player's _play_sound_always for one test."""
+    mock = Mock()
+    monkeypatch.setattr(player, "_play_sound_always", mock)
+    return mock
+
+
 class TestSoundPlayer:
     """Tests for SoundPlayer class."""
 
-    def test_initial_enabled_state(self):
+    def test_initial_enabled_state(self, sound_state):
         """Test initial enabled state matches config."""
-        original_enabled = config.sound_enabled
-        try:
-            config.sound_enabled = True
-            player = SoundPlayer()
-            assert player.enabled is True
-
-            config.sound_enabled = False
-            player2 = SoundPlayer()
-            assert player2.enabled is False
-        finally:
-            config.sound_enabled = original_enabled
-
-    def test_enabled_setter(self):
-        """Test enabled property can be set."""
-        original_enabled = config.sound_enabled
-        try:
-            config.sound_enabled = True
-            player = SoundPlayer()
+        player = SoundPlayer()
+        assert player.enabled is True
 
-            player.enabled = False
-            assert player.enabled is False
+        sound_state.sound_enabled = False
+        player2 = SoundPlayer()
+        assert player2.enabled is False
 
-            player.enabled = True
-            assert player.enabled is True
-        finally:
-            config.sound_enabled = original_enabled
+    def test_enabled_setter(self, player):
+        """Test enabled property can be set."""
+        player.enabled = False
+        assert player.enabled is False
+
+        player.enabled = True
+        assert player.enabled is True
 
-    def test_play_sound_respects_enabled(self):
+    def test_play_sound_respects_enabled(
+        self, player, sound_state, monkeypatch, mock_play
+    ):
         """Test that _play_sound does not play when disabled."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = False
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                player._play_sound("test.wav")
-                mock_play.assert_not_called()
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_sound_respects_muted(self):
+        monkeypatch.setattr(player, "enabled", False)
+
+        player._play_sound("test.wav")
+        mock_play.assert_not_called()
+
+    def test_play_sound_respects_muted(self, player, sound_state, mock_play):
         """Test that _play_sound does not play when muted.
 
         This is the key test for the bug fix - notification sounds should
         NOT play when the app is muted.
         """
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = True  # App is muted
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                player._play_sound("test.wav")
-                mock_play.assert_not_called()
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_sound_plays_when_enabled_and_not_muted(self):
+        sound_state.muted = True  # App is muted
+
+        player._play_sound("test.wav")
+        mock_play.assert_not_called()
+
+    def test_play_sound_plays_when_enabled_and_not_muted(
+        self, player, sound_state, mock_play
+    ):
         """Test that _play_sound plays when enabled and not muted."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                player._play_sound("test.wav")
-                mock_play.assert_called_once_with("test.wav")
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_chat_sound_uses_config_path(self):
-        """Test that play_chat_sound uses the configured sound path."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound") as mock_play:
-                player.play_chat_sound()
-                mock_play.assert_called_once_with(config.chat_sound)
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_urgent_sound_uses_config_path(self):
-        """Test that play_urgent_sound uses the configured sound path."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound") as mock_play:
-                player.play_urgent_sound()
-                mock_play.assert_called_once_with(config.urgent_sound)
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_muted_sound_always_plays(self):
-        """Test that play_muted_sound uses _play_sound_always (ignores mute)."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = True  # Even when muted
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                player.play_muted_sound()
-                mock_play.assert_called_once_with(config.muted_sound)
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_play_unmuted_sound_always_plays(self):
-        """Test that play_unmuted_sound uses _play_sound_always (ignores mute)."""
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                player.play_unmuted_sound()
-                mock_play.assert_called_once_with(config.unmuted_sound)
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_mute_toggle_updates_sound_behavior(self):
+        player._play_sound("test.wav")
+        mock_play.assert_called_once_with("test.wav")
+
+    @pytest.mark.parametrize(
+        ("method", "sound_attr", "target", "muted"),
+        [
+            ("play_chat_sound", "chat_sound", "_play_sound", False),
+            ("play_urgent_sound", "urgent_sound", "_play_sound", False),
+            # Mute feedback ignores mute, so it goes to _play_sound_always
+            ("play_muted_sound", "muted_sound", "_play_sound_always", True),
+            ("play_unmuted_sound", "unmuted_sound", "_play_sound_always", False),
+        ],
+    )
+    def test_play_methods_use_config_path(
+        self, player, sound_state, method, sound_attr, target, muted
+    ):
+        """Test that each play method plays its configured sound path."""
+        sound_state.muted = muted
+
+        with patch.object(player, target) as mock_play:
+            getattr(player, method)()
+            mock_play.assert_called_once_with(getattr(config, sound_attr))
+
+    def test_mute_toggle_updates_sound_behavior(self, player, sound_state, mock_play):
         """Test that toggling mute in config affects sound playback.
 
         This simulates the real-world scenario where user toggles mute
         and subsequent notification sounds should respect the mute state.
         """
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = False
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                # Sound should play when not muted
-                player._play_sound("test.wav")
-                assert mock_play.call_count == 1
-
-                # User mutes the app
-                config.muted = True
-
-                # Sound should NOT play when muted
-                player._play_sound("test.wav")
-                assert mock_play.call_count == 1  # Still 1, no new call
-
-                # User unmutes the app
-                config.muted = False
-
-                # Sound should play again
-                player._play_sound("test.wav")
-                assert mock_play.call_count == 2
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_resolve_sound_path_absolute(self):
-        """Test resolving an absolute sound path."""
-        player = SoundPlayer()
-
-        path = player._resolve_sound_path("/absolute/path/to/sound.wav")
-        assert str(path) == "/absolute/path/to/sound.wav"
-
-    def test_resolve_sound_path_relative(self):
-        """Test resolving a relative sound path."""
+        # Sound should play when not muted
+        player._play_sound("test.wav")
+        assert mock_play.call_count == 1
+
+        # User mutes the app
+        sound_state.muted = True
+
+        # Sound should NOT play when muted
+        player._play_sound("test.wav")
+        assert mock_play.call_count == 1  # Still 1, no new call
+
+        # User unmutes the app
+        sound_state.muted = False
+
+        # Sound should play again
+        player._play_sound("test.wav")
+        assert mock_play.call_count == 2
+
+    @pytest.mark.parametrize(
+        "sound_path",
+        ["/absolute/path/to/sound.wav", "resources/audio/test.wav"],
+        ids=["absolute", "relative"],
+    )
+    def test_resolve_sound_path(self, player, sound_path):
+        """Test that sound paths resolve to absolute paths ending in the input."""
+        path = player._resolve_sound_path(sound_path)
+        assert os.path.isabs(path)
+        assert path.endswith(sound_path)
+
+    def test_play_sound_always_uses_preloaded_player(self, fresh_player):
+        """Test that a preloaded player is used instead of spawning afplay."""
+        player = fresh_player
+        av_player = MagicMock()
+        player._pool[config.chat_sound] = [av_player]
+        player._pool_index[config.chat_sound] = 0
+
+        with patch.object(player._afplay_queue, "put_nowait") as mock_put:
+            player._play_sound_always(config.chat_sound)
+
+        av_player.play.assert_called_once()
+        mock_put.assert_not_called()
+
+    def test_play_sound_always_rotates_through_pool(self, fresh_player):
+        """Test that back-to-back sounds use different pooled players."""
+        player = fresh_player
+        pool = [MagicMock(), MagicMock()]
+        player._pool[config.chat_sound] = pool
+        player._pool_index[config.chat_sound] = 0
+
+        for _ in range(3):
+            player._last_played.clear()  # Don't coalesce the repeats
+            player._play_sound_always(config.chat_sound)
+
+        assert pool[0].play.call_count == 2
+        assert pool[1].play.call_count == 1
+
+    def test_configured_sound_paths_are_cached(self, player):
+        """Test that configured sounds are resolved once at construction."""
+        assert player._resolved[config.chat_sound] == player._resolve_sound_path(
+            config.chat_sound
+        )
+        assert set(player._exists) == set(player._resolved)
+
+    def test_afplay_fallback_is_queued_for_worker(self, fresh_player):
+        """Test that sounds without a preloaded player are queued for afplay."""
+        player = fresh_player
+
+        with (
+            patch("src.audio.sound_player.AFPLAY_PATH", "/usr/bin/afplay"),
+            patch.object(player, "_start_afplay_worker"),
+            patch.object(player._afplay_queue, "put_nowait") as mock_put,
+        ):
+            player._play_sound_always(config.chat_sound)
+
+        mock_put.assert_called_once_with(player._resolved[config.chat_sound])
+
+    def test_afplay_worker_starts_lazily_and_stops_on_close(self, sound_state):
+        """Test that the afplay worker starts on first use and close() stops it."""
         player = SoundPlayer()
-
-        path = player._resolve_sound_path("resources/audio/test.wav")
-        assert path.is_absolute()
-        assert str(path).endswith("resources/audio/test.wav")
+        player._pool.clear()
+        assert player._afplay_worker is None
+
+        with (
+            patch("src.audio.sound_player.AFPLAY_PATH", "/usr/bin/afplay"),
+            patch.object(player, "_run_afplay") as mock_run,
+        ):
+            player._play_sound_always(config.chat_sound)
+            worker = player._afplay_worker
+            assert worker.is_alive()
+            player.close()
+
+        assert not worker.is_alive()
+        assert player._afplay_worker is None
+        mock_run.assert_called_once_with(player._resolved[config.chat_sound])
+
+    def test_missing_afplay_falls_back_to_beep(self, fresh_player):
+        """Test that sounds beep instead of queueing when afplay is missing."""
+        player = fresh_player
+
+        with (
+            patch("src.audio.sound_player.AFPLAY_PATH", None),
+            patch.object(player, "_system_beep") as mock_beep,
+            patch.object(player._afplay_queue, "put_nowait") as mock_put,
+        ):
+            player._play_sound_always(config.chat_sound)
+
+        mock_beep.assert_called_once()
+        mock_put.assert_not_called()
+
+    def test_repeated_sound_is_coalesced(self, fresh_player):
+        """Test that the same sound fired twice in quick succession plays once."""
+        player = fresh_player
+        av_player = MagicMock()
+        player._pool[config.chat_sound] = [av_player]
+        player._pool_index[config.chat_sound] = 0
+
+        player._play_sound_always(config.chat_sound)
+        player._play_sound_always(config.chat_sound)
+
+        av_player.play.assert_called_once()
+
+    def test_afplay_batch_skips_consecutive_duplicates(self, player, monkeypatch):
+        """Test that queued duplicate sounds are played once per batch."""
+        monkeypatch.setattr(player, "_afplay_queue", queue.Queue())
+        chat_path = player._resolved[config.chat_sound]
+        urgent_path = player._resolved[config.urgent_sound]
+        for path in (chat_path, chat_path, urgent_path, urgent_path):
+            player._afplay_queue.put(path)
+
+        assert player._next_afplay_batch() == [chat_path, urgent_path]
+        assert player._afplay_queue.empty()
+
+    def test_afplay_sounds_overlap_up_to_limit(self, fresh_player):
+        """Test that afplay starts without waiting, dropping past the limit."""
+        player = fresh_player
+        path = player._resolved[config.chat_sound]
+
+        with (
+            patch("src.audio.sound_player.AFPLAY_PATH", "/usr/bin/afplay"),
+            patch("src.audio.sound_player.os.posix_spawn") as mock_spawn,
+            patch("src.audio.sound_player.os.waitpid", return_value=(0, 0)),
+        ):
+            mock_spawn.side_effect = range(1000, 2000)
+            for _ in range(MAX_AFPLAY_PROCESSES + 1):
+                player._run_afplay(path)
+
+        assert mock_spawn.call_count == MAX_AFPLAY_PROCESSES
+
+    def test_finished_afplay_processes_are_reaped(self, fresh_player):
+        """Test that exited afplay processes no longer count toward the limit."""
+        player = fresh_player
+        player._afplay_pids = list(range(1000, 1000 + MAX_AFPLAY_PROCESSES))
+
+        with (
+            patch("src.audio.sound_player.AFPLAY_PATH", "/usr/bin/afplay"),
+            patch("src.audio.sound_player.os.posix_spawn", return_value=2000),
+            patch(
+                "src.audio.sound_player.os.waitpid",
+                side_effect=lambda pid, options: (pid, 0),  # Exited cleanly
+            ),
+        ):
+            player._run_afplay(player._resolved[config.chat_sound])
+
+        assert player._afplay_pids == [2000]
 
 
 class TestSoundPlayerIntegration:
     """Integration tests for sound player with mute state."""
 
-    def test_notification_sound_blocked_when_muted(self):
+    def test_notification_sound_blocked_when_muted(
+        self, player, sound_state, mock_play
+    ):
         """Test that chat/urgent sounds don't play when muted.
 
         This is the key integration test for the bug fix.
         """
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = True  # App is muted
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                # These should NOT play when muted
-                player.play_chat_sound()
-                player.play_urgent_sound()
-
-                mock_play.assert_not_called()
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
-
-    def test_mute_feedback_sounds_play_when_muted(self):
+        sound_state.muted = True  # App is muted
+
+        # These should NOT play when muted
+        player.play_chat_sound()
+        player.play_urgent_sound()
+
+        mock_play.assert_not_called()
+
+    def test_mute_feedback_sounds_play_when_muted(self, player, sound_state, mock_play):
         """Test that mute/unmute feedback sounds play regardless of mute state.
 
         The muted/unmuted audio feedback should always play so the user
         knows the state changed.
         """
-        original_enabled = config.sound_enabled
-        original_muted = config.muted
-        try:
-            config.sound_enabled = True
-            config.muted = True  # Even when muted
-            player = SoundPlayer()
-
-            with patch.object(player, "_play_sound_always") as mock_play:
-                # These SHOULD play even when muted
-                player.play_muted_sound()
-                player.play_unmuted_sound()
-
-                assert mock_play.call_count == 2
-        finally:
-            config.sound_enabled = original_enabled
-            config.muted = original_muted
+        sound_state.muted = True  # Even when muted
+
+        # These SHOULD play even when muted
+        player.play_muted_sound()
+        player.play_unmuted_sound()
+
+        assert mock_play.call_count == 2
@@ -1,6 +1,10 @@
 """Tests for the alert window UI."""
 
-from unittest.mock import MagicMock
+import asyncio
+import threading
+from unittest.mock import MagicMock, Mock
+
+import pytest
 
 from src.ui.alert_window import AlertWindow, AlertState
 from src.config import config
@@ -16,19 +20,14 @@ class TestAlertWindow:
         assert window.state == AlertState.IDLE
         assert window.total_count == 0
 
-    def test_initial_mute_state(self):
+    def test_initial_mute_state(self, sound_state):
         """Test initial mute state matches config."""
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
-            assert window.muted is False
-
-            config.muted = True
-            window2 = AlertWindow()
-            assert window2.muted is True
-        finally:
-            config.muted = original_muted
+        window = AlertWindow()
+        assert window.muted is False
+
+        sound_state.muted = True
+        window2 = AlertWindow()
+        assert window2.muted is True
 
     def test_notify_chat(self):
         """Test chat notification changes state."""
@@ -50,25 +49,21 @@ class TestAlertWindow:
         assert window.state == AlertState.URGENT
         assert window.total_count == 1
 
-    def test_urgent_overrides_chat(self):
-        """Test that urgent state takes priority over chat."""
+    @pytest.mark.parametrize(
+        ("first", "second"),
+        [
+            ("_process_chat", "_process_urgent"),
+            ("_process_urgent", "_process_chat"),
+        ],
+    )
+    def test_urgent_takes_priority_over_chat(self, first, second):
+        """Test that urgent wins over chat in either order."""
         window = AlertWindow()
 
-        window._process_chat()
-        assert window.state == AlertState.CHAT
+        getattr(window, first)()
+        getattr(window, second)()
 
-        window._process_urgent()
         assert window.state == AlertState.URGENT
-
-    def test_chat_does_not_override_urgent(self):
-        """Test that chat does not override urgent state."""
-        window = AlertWindow()
-
-        window._process_urgent()
-        assert window.state == AlertState.URGENT
-
-        window._process_chat()
-        assert window.state == AlertState.URGENT  # Still urgent
         assert window.total_count == 2
 
     def test_reset(self):
@@ -87,7 +82,7 @@ class TestAlertWindow:
     def test_reset_callback(self):
         """Test reset callback is invoked."""
         window = AlertWindow()
-        callback = MagicMock()
+        callback = Mock()
         window.on_reset(callback)
 
         window._process_chat()
@@ -95,104 +90,161 @@ class TestAlertWindow:
 
         callback.assert_called_once()
 
-    def test_multiple_notifications(self):
-        """Test multiple notifications increment count."""
+    @pytest.mark.parametrize(
+        ("sequence", "chat_count", "urgent_count", "state"),
+        [
+            (("chat", "chat", "chat"), 3, 0, AlertState.CHAT),
+            (("chat", "urgent", "chat"), 2, 1, AlertState.URGENT),
+        ],
+        ids=["chat-only", "mixed"],
+    )
+    def test_notification_counts(self, sequence, chat_count, urgent_count, state):
+        """Test that each notification is counted by type."""
         window = AlertWindow()
 
-        window._process_chat()
-        window._process_chat()
-        window._process_chat()
+        for kind in sequence:
+            getattr(window, f"_process_{kind}")()
 
-        assert window.total_count == 3
-        assert window._chat_count == 3
-        assert window._urgent_count == 0
+        assert window.total_count == len(sequence)
+        assert window._chat_count == chat_count
+        assert window._urgent_count == urgent_count
+        assert window.state == state
 
-    def test_mixed_notifications(self):
-        """Test mixed notification types."""
+    def test_notify_before_build_is_held(self):
+        """Test that notifications before build() are held, not processed."""
         window = AlertWindow()
 
+        window.notify_chat()
+        window.notify_urgent()
+
+        assert len(window._pending_notifications) == 2
+        assert window.total_count == 0
+
+    def test_notify_from_thread_runs_on_loop(self, loop):
+        """Test that notifications from another thread run on the UI loop."""
+        window = AlertWindow()
+        window.notify_chat()  # Held until the loop is attached
+
+        async def scenario():
+            window._attach_loop()
+            thread = threading.Thread(target=window.notify_urgent)
+            thread.start()
+            thread.join()
+            for _ in range(3):
+                await asyncio.sleep(0)
+
+        loop.run_until_complete(scenario())
+
+        assert window._pending_notifications == []
+        assert window.total_count == 2
+        assert window.state == AlertState.URGENT
+
+    def test_animation_class_follows_state(self, sound_state):
+        """Test that the light gets the CSS animation class for its state."""
+        window = AlertWindow()
+        window._light_element = MagicMock()
+
         window._process_chat()
+        assert window._light_element.classes.call_args.kwargs["add"] == "alert-pulse"
+
         window._process_urgent()
-        window._process_chat()
+        assert window._light_element.classes.call_args.kwargs["add"] == "alert-flash"
 
-        assert window.total_count == 3
-        assert window._chat_count == 2
-        assert window._urgent_count == 1
-        assert window.state == AlertState.URGENT
+        window.reset()
+        assert window._light_element.classes.call_args.kwargs["add"] is None
 
-    def test_notify_queues_notification(self):
-        """Test that notify_chat and notify_urgent queue notifications."""
+    def test_muted_light_is_not_animated(self, sound_state):
+        """Test that muting stops the animation and unmuting restores it."""
         window = AlertWindow()
+        window._light_element = MagicMock()
+        window._process_urgent()
 
-        # These should queue notifications, not process immediately
-        window.notify_chat()
-        window.notify_urgent()
+        window.toggle_mute()
+        assert window._light_element.classes.call_args.kwargs["add"] is None
+
+        window.toggle_mute()
+        assert window._light_element.classes.call_args.kwargs["add"] == "alert-flash"
+
+    def test_glow_only_updated_on_change(self):
+        """Test that the glow style is only pushed when its inputs change."""
+        window = AlertWindow()
+        window._light_element = MagicMock()
 
-        # Queue should have 2 items
-        assert window._notification_queue.qsize() == 2
+        window._update_glow()
+        window._update_glow()
+        assert window._light_element.style.call_count == 1
 
-    def test_toggle_mute(self):
+        window._process_chat()
+        glow_styles = [
+            call.args[0]
+            for call in window._light_element.style.call_args_list
+            if call.args[0].startswith("box-shadow")
+        ]
+        assert len(glow_styles) == 2
+        assert "234, 179, 8" in glow_styles[-1]
+
+    def test_light_color_only_restyled_on_change(self):
+        """Test that an unchanged light color doesn't restyle the element."""
+        window = AlertWindow()
+        window._light_element = MagicMock()
+
+        window._update_light_color()
+        window._update_light_color()
+
+        color_styles = [
+            call.args[0]
+            for call in window._light_element.style.call_args_list
+            if call.args[0].startswith("background-color")
+        ]
+        assert color_styles == [f"background-color: {config.color_idle}"]
+
+    def test_toggle_mute(self, sound_state):
         """Test toggling mute state."""
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
+        window = AlertWindow()
 
-            assert window.muted is False
+        assert window.muted is False
 
-            window.toggle_mute()
-            assert window.muted is True
-            assert config.muted is True
+        window.toggle_mute()
+        assert window.muted is True
+        assert sound_state.muted is True
 
-            window.toggle_mute()
-            assert window.muted is False
-            assert config.muted is False
-        finally:
-            config.muted = original_muted
+        window.toggle_mute()
+        assert window.muted is False
+        assert sound_state.muted is False
 
-    def test_mute_callback(self):
+    def test_mute_callback(self, sound_state):
         """Test mute callback is invoked with correct state."""
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
-            callback = MagicMock()
-            window.on_mute(callback)
-
-            window.toggle_mute()
-            callback.assert_called_once_with(True)
-
-            callback.reset_mock()
-            window.toggle_mute()
-            callback.assert_called_once_with(False)
-        finally:
-            config.muted = original_muted
-
-    def test_on_mute_clears_existing_callbacks(self):
+        window = AlertWindow()
+        callback = Mock()
+        window.on_mute(callback)
+
+        window.toggle_mute()
+        callback.assert_called_once_with(True)
+
+        callback.reset_mock()
+        window.toggle_mute()
+        callback.assert_called_once_with(False)
+
+    def test_on_mute_clears_existing_callbacks(self, sound_state):
         """Test that on_mute clears existing callbacks before adding new one.
 
         This prevents double audio feedback when the page is refreshed/revisited.
         """
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
+        window = AlertWindow()
 
-            callback1 = MagicMock()
-            callback2 = MagicMock()
+        callback1 = Mock()
+        callback2 = Mock()
 
-            # Register first callback
-            window.on_mute(callback1)
-            # Register second callback (should replace first)
-            window.on_mute(callback2)
+        # Register first callback
+        window.on_mute(callback1)
+        # Register second callback (should replace first)
+        window.on_mute(callback2)
 
-            window.toggle_mute()
+        window.toggle_mute()
 
-            # Only callback2 should be called (callback1 was cleared)
-            callback1.assert_not_called()
-            callback2.assert_called_once_with(True)
-        finally:
-            config.muted = original_muted
+        # Only callback2 should be called (callback1 was cleared)
+        callback1.assert_not_called()
+        callback2.assert_called_once_with(True)
 
     def test_on_reset_clears_existing_callbacks(self):
         """Test that on_reset clears existing callbacks before adding new one.
@@ -201,8 +253,8 @@ class TestAlertWindow:
         """
         window = AlertWindow()
 
-        callback1 = MagicMock()
-        callback2 = MagicMock()
+        callback1 = Mock()
+        callback2 = Mock()
 
         # Register first callback
         window.on_reset(callback1)
@@ -216,43 +268,33 @@ class TestAlertWindow:
         callback1.assert_not_called()
         callback2.assert_called_once()
 
-    def test_mute_preserves_notification_count(self):
+    def test_mute_preserves_notification_count(self, sound_state):
         """Test that muting preserves notification count."""
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
+        window = AlertWindow()
 
-            window._process_chat()
-            window._process_urgent()
-            assert window.total_count == 2
+        window._process_chat()
+        window._process_urgent()
+        assert window.total_count == 2
 
-            window.toggle_mute()
-            assert window.muted is True
-            assert window.total_count == 2  # Count preserved
+        window.toggle_mute()
+        assert window.muted is True
+        assert window.total_count == 2  # Count preserved
 
-            window._process_chat()  # Should still count while muted
-            assert window.total_count == 3
-        finally:
-            config.muted = original_muted
+        window._process_chat()  # Should still count while muted
+        assert window.total_count == 3
 
-    def test_reset_does_not_affect_mute(self):
+    def test_reset_does_not_affect_mute(self, sound_state):
         """Test that reset does not change mute state."""
-        original_muted = config.muted
-        try:
-            config.muted = False
-            window = AlertWindow()
+        window = AlertWindow()
 
-            window.toggle_mute()
-            assert window.muted is True
+        window.toggle_mute()
+        assert window.muted is True
 
-            window._process_chat()
-            window.reset()
+        window._process_chat()
+        window.reset()
 
-            assert window.muted is True  # Still muted after reset
-            assert window.total_count == 0
-        finally:
-            config.muted = original_muted
+        assert window.muted is True  # Still muted after reset
+        assert window.total_count == 0
 
 
 class TestAlertState:
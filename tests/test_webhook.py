@@ -1,31 +1,105 @@
 """Tests for webhook sender."""
 
 import asyncio
+import io
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
 from unittest.mock import AsyncMock, patch, MagicMock
 
-from src.webhook.sender import WebhookSender
+import aiohttp
+import pytest
+import requests
+import urllib3
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from yarl import URL
 
+from src.webhook.sender import (
+    ERROR_BODY_SNIPPET_SIZE,
+    MAX_RETRIES,
+    WebhookSender,
+    _retry_delay,
+)
 
-class TestWebhookSender:
-    """Tests for WebhookSender class."""
 
-    def test_init_with_url(self):
-        """Test initialization with a webhook URL."""
-        sender = WebhookSender("https://example.com/webhook")
-        assert sender.webhook_url == "https://example.com/webhook"
-        assert sender.enabled is True
+class FakeContent:
+    """Response body stream that records how much was read."""
 
-    def test_init_without_url(self):
-        """Test initialization without a webhook URL."""
-        sender = WebhookSender(None)
-        assert sender.webhook_url is None
-        assert sender.enabled is False
+    def __init__(self, body: bytes):
+        self._body = body
+        self.reads: list[int] = []
+
+    async def read(self, n: int = -1) -> bytes:
+        self.reads.append(n)
+        return self._body if n < 0 else self._body[:n]
+
+
+class FakeResponse:
+    """Stand-in for the aiohttp response returned by session.post()."""
+
+    def __init__(self, status=200, headers=None, body=b"error"):
+        self.status = status
+        self.headers = headers or {}
+        self.content = FakeContent(body)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return None
+
+
+def make_sync_response(status: int, body: io.BytesIO | None = None):
+    """A requests response whose body is streamed from memory."""
+    response = requests.Response()
+    response.status_code = status
+    response.raw = urllib3.HTTPResponse(
+        body=body or io.BytesIO(), status=status, preload_content=False
+    )
+    return response
 
-    def test_init_with_empty_url(self):
-        """Test initialization with empty webhook URL."""
-        sender = WebhookSender("")
-        assert sender.webhook_url == ""
-        assert sender.enabled is False
+
+@pytest.fixture(scope="module")
+def sender(loop):
+    """A WebhookSender for the test URL, shared by tests of async sends.
+
+    Every enabled sender starts a send worker thread, so tests that only
+    drive send_notification() against a mocked session reuse one.
+    """
+    sender = WebhookSender("https://example.com/webhook")
+    yield sender
+    loop.run_until_complete(sender.close())
+
+
+@pytest.fixture
+def mock_session(sender, monkeypatch):
+    """Mocked aiohttp session installed on the shared sender for one test.
+
+    Posts get a 200 response unless the test reconfigures session.post.
+    """
+    session = MagicMock(spec_set=aiohttp.ClientSession)
+    session.post = MagicMock(return_value=FakeResponse())
+    session.closed = False
+    monkeypatch.setattr(sender, "_get_session", AsyncMock(return_value=session))
+    return session
+
+
+class TestWebhookSender:
+    """Tests for WebhookSender class."""
+
+    @pytest.mark.parametrize(
+        ("webhook_url", "enabled"),
+        [("https://example.com/webhook", True), (None, False), ("", False)],
+        ids=["url", "none", "empty"],
+    )
+    def test_init_url(self, webhook_url, enabled):
+        """Test that webhooks are enabled only when a URL is configured."""
+        sender = WebhookSender(webhook_url)
+        assert sender.webhook_url == webhook_url
+        assert sender.enabled is enabled
 
     def test_init_with_custom_payloads(self):
         """Test initialization with custom payloads."""
@@ -74,75 +148,103 @@ class TestWebhookSender:
         assert headers["Content-Type"] == "application/json"
         assert headers["Authorization"] == "Bearer my-secret-token"
 
-    def test_get_payload_with_custom(self):
-        """Test _get_payload returns custom payload when configured."""
-        custom_payload = {"userId": "test-123", "actionFields": {"color": "red"}}
+    def test_headers_built_once(self):
+        """Test that requests share the headers built at init."""
         sender = WebhookSender(
             webhook_url="https://example.com/webhook",
-            payload_urgent=custom_payload,
+            bearer_token="my-secret-token",
+        )
+        with patch.object(sender._requests_session, "post") as mock_post:
+            mock_post.return_value.status_code = 200
+            sender._send_sync_request("message")
+            sender._send_sync_request("clear")
+
+        for call in mock_post.call_args_list:
+            assert call.kwargs["headers"] is sender._headers
+
+    @pytest.mark.parametrize(
+        ("payloads", "notification_type", "expected"),
+        [
+            (
+                {"payload_urgent": {"userId": "test-123"}},
+                "urgent",
+                {"userId": "test-123"},
+            ),
+            (
+                {},
+                "message",
+                {
+                    "type": "message",
+                    "timestamp": "2024-01-01T09:30:00.000000Z",
+                    "source": "teams-notifier",
+                },
+            ),
+            # Types without a custom payload still get the default
+            (
+                {"payload_urgent": {"userId": "test-123"}},
+                "clear",
+                {
+                    "type": "clear",
+                    "timestamp": "2024-01-01T09:30:00.000000Z",
+                    "source": "teams-notifier",
+                },
+            ),
+        ],
+        ids=["custom", "default", "partial-custom"],
+    )
+    def test_get_payload(self, monkeypatch, payloads, notification_type, expected):
+        """Test _get_payload returns the custom payload or the default."""
+        monkeypatch.setattr(
+            "src.webhook.sender._utc_timestamp",
+            lambda: "2024-01-01T09:30:00.000000Z",
         )
+        sender = WebhookSender(webhook_url="https://example.com/webhook", **payloads)
 
-        payload = sender._get_payload("urgent")
-        assert payload == custom_payload
+        assert sender._get_payload(notification_type) == expected
 
-    def test_get_payload_default(self):
-        """Test _get_payload returns default payload when not configured."""
+    def test_get_payload_default_timestamp_is_utc_iso(self):
+        """Test the default payload timestamp is ISO 8601 UTC with a Z suffix."""
         sender = WebhookSender(webhook_url="https://example.com/webhook")
 
-        payload = sender._get_payload("message")
+        timestamp = sender._get_payload("message")["timestamp"]
 
-        assert "type" in payload
-        assert payload["type"] == "message"
-        assert "timestamp" in payload
-        assert "source" in payload
-        assert payload["source"] == "teams-notifier"
+        assert timestamp.endswith("Z")
+        parsed = datetime.fromisoformat(timestamp)
+        assert parsed.utcoffset() == timedelta(0)
 
-    def test_get_payload_partial_custom(self):
-        """Test _get_payload with only some custom payloads configured."""
-        custom_urgent = {"custom": "urgent-payload"}
+    def test_get_payload_bytes_custom_is_precomputed(self):
+        """Test custom payloads are serialized once and reused."""
+        custom_payload = {"command": "color.set", "payload": {"r": 255}}
         sender = WebhookSender(
             webhook_url="https://example.com/webhook",
-            payload_urgent=custom_urgent,
+            payload_urgent=custom_payload,
         )
 
-        # Custom payload should be returned for urgent
-        urgent_payload = sender._get_payload("urgent")
-        assert urgent_payload == custom_urgent
+        payload_bytes = sender._get_payload_bytes("urgent")
+        assert json.loads(payload_bytes) == custom_payload
+        assert sender._get_payload_bytes("urgent") is payload_bytes
 
-        # Default payload should be returned for message
-        message_payload = sender._get_payload("message")
-        assert message_payload["type"] == "message"
-        assert "timestamp" in message_payload
+    def test_get_payload_bytes_default(self):
+        """Test default payload is serialized with its type."""
+        sender = WebhookSender(webhook_url="https://example.com/webhook")
 
-    def test_send_notification_disabled(self):
+        payload = json.loads(sender._get_payload_bytes("clear"))
+        assert payload["type"] == "clear"
+        assert payload["source"] == "teams-notifier"
+
+    def test_send_notification_disabled(self, loop):
         """Test that send_notification returns False when disabled."""
         sender = WebhookSender(None)
-        result = asyncio.get_event_loop().run_until_complete(
-            sender.send_notification("message")
-        )
+        result = loop.run_until_complete(sender.send_notification("message"))
         assert result is False
 
-    def test_send_notification_success(self):
+    def test_send_notification_success(self, loop, sender, mock_session):
         """Test successful webhook notification."""
-        sender = WebhookSender("https://example.com/webhook")
-
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.__aenter__ = AsyncMock(return_value=mock_response)
-        mock_response.__aexit__ = AsyncMock(return_value=None)
-
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=mock_response)
-        mock_session.closed = False
-
-        async def run_test():
-            with patch.object(sender, "_get_session", return_value=mock_session):
-                return await sender.send_notification("message")
-
-        result = asyncio.get_event_loop().run_until_complete(run_test())
+        result = loop.run_until_complete(sender.send_notification("message"))
         assert result is True
+        mock_session.post.assert_called_once()
 
-    def test_send_notification_with_custom_payload(self):
+    def test_send_notification_with_custom_payload(self, loop):
         """Test webhook sends custom payload when configured."""
         custom_payload = {"userId": "abc", "actionFields": {"color": "yellow"}}
         sender = WebhookSender(
@@ -150,47 +252,38 @@ class TestWebhookSender:
             payload_message=custom_payload,
         )
 
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.__aenter__ = AsyncMock(return_value=mock_response)
-        mock_response.__aexit__ = AsyncMock(return_value=None)
-
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=mock_response)
+        mock_session = MagicMock(spec_set=aiohttp.ClientSession)
+        mock_session.post = MagicMock(return_value=FakeResponse())
         mock_session.closed = False
 
         async def run_test():
             with patch.object(sender, "_get_session", return_value=mock_session):
                 return await sender.send_notification("message")
 
-        result = asyncio.get_event_loop().run_until_complete(run_test())
+        result = loop.run_until_complete(run_test())
         assert result is True
 
         # Verify the custom payload was sent
         call_args = mock_session.post.call_args
-        assert call_args.kwargs["json"] == custom_payload
+        assert json.loads(call_args.kwargs["data"]) == custom_payload
+        assert call_args.args[0] == URL("https://example.com/webhook")
 
-    def test_send_notification_with_bearer_token(self):
+    def test_send_notification_with_bearer_token(self, loop):
         """Test webhook sends Authorization header when bearer token configured."""
         sender = WebhookSender(
             webhook_url="https://example.com/webhook",
             bearer_token="test-bearer-token",
         )
 
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.__aenter__ = AsyncMock(return_value=mock_response)
-        mock_response.__aexit__ = AsyncMock(return_value=None)
-
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=mock_response)
+        mock_session = MagicMock(spec_set=aiohttp.ClientSession)
+        mock_session.post = MagicMock(return_value=FakeResponse())
         mock_session.closed = False
 
         async def run_test():
             with patch.object(sender, "_get_session", return_value=mock_session):
                 return await sender.send_notification("message")
 
-        result = asyncio.get_event_loop().run_until_complete(run_test())
+        result = loop.run_until_complete(run_test())
         assert result is True
 
         # Verify the Authorization header was sent
@@ -200,25 +293,271 @@ class TestWebhookSender:
             call_args.kwargs["headers"]["Authorization"] == "Bearer test-bearer-token"
         )
 
-    def test_send_notification_types(self):
+    @pytest.mark.parametrize("notification_type", ["message", "urgent", "clear"])
+    def test_send_notification_types(
+        self, loop, sender, mock_session, notification_type
+    ):
         """Test that all notification types can be sent."""
+        assert loop.run_until_complete(sender.send_notification(notification_type))
+
+
+class TestWebhookRetry:
+    """Tests for retrying failed async sends."""
+
+    @pytest.fixture
+    def sleep(self, monkeypatch):
+        """Record backoff waits instead of sleeping."""
+        sleep = AsyncMock()
+        monkeypatch.setattr("src.webhook.sender.asyncio.sleep", sleep)
+        return sleep
+
+    def test_server_error_is_retried(self, loop, sender, mock_session, sleep):
+        """Test that a 5xx response is retried on the same session."""
+        mock_session.post.side_effect = [FakeResponse(503), FakeResponse(200)]
+
+        assert loop.run_until_complete(sender.send_notification("message")) is True
+        assert mock_session.post.call_count == 2
+        sleep.assert_awaited_once()
+
+    def test_client_error_is_not_retried(self, loop, sender, mock_session, sleep):
+        """Test that a 4xx response fails without retrying."""
+        mock_session.post.return_value = FakeResponse(400)
+
+        assert loop.run_until_complete(sender.send_notification("message")) is False
+        assert mock_session.post.call_count == 1
+        sleep.assert_not_awaited()
+
+    def test_error_body_read_is_capped(self, loop, sender, mock_session, sleep):
+        """Test that only a snippet of an error response body is read."""
+        response = FakeResponse(404)
+        mock_session.post.return_value = response
+
+        assert loop.run_until_complete(sender.send_notification("message")) is False
+        assert response.content.reads == [ERROR_BODY_SNIPPET_SIZE]
+
+    def test_retries_are_bounded(self, loop, sender, mock_session, sleep):
+        """Test that a persistently failing webhook gives up after the retries."""
+        mock_session.post.return_value = FakeResponse(500)
+
+        assert loop.run_until_complete(sender.send_notification("message")) is False
+        assert mock_session.post.call_count == MAX_RETRIES + 1
+        assert sleep.await_count == MAX_RETRIES
+
+    def test_timeout_is_retried(self, loop, sender, mock_session, sleep):
+        """Test that a timed out request is retried."""
+        mock_session.post.side_effect = [TimeoutError(), FakeResponse(200)]
+
+        assert loop.run_until_complete(sender.send_notification("message")) is True
+        assert mock_session.post.call_count == 2
+
+    def test_rate_limit_honors_retry_after(self, loop, sender, mock_session, sleep):
+        """Test that a 429 waits for the server's Retry-After."""
+        mock_session.post.side_effect = [
+            FakeResponse(429, {"Retry-After": "2"}),
+            FakeResponse(200),
+        ]
+
+        assert loop.run_until_complete(sender.send_notification("message")) is True
+        sleep.assert_awaited_once_with(2.0)
+
+    def test_retry_delay(self):
+        """Test backoff growth and Retry-After handling."""
+        assert 0.05 <= _retry_delay(0) < 0.1
+        assert 0.2 <= _retry_delay(2) < 0.25
+        assert _retry_delay(0, "1") == 1.0
+        assert _retry_delay(0, "3600") == 5.0
+        # HTTP-date form falls back to backoff
+        assert _retry_delay(0, "Wed, 21 Oct 2015 07:28:00 GMT") < 0.1
+
+
+class TestWebhookSession:
+    """Tests for the shared aiohttp session."""
+
+    def test_session_is_reused(self, loop):
+        """Test that sends share one session with a tuned connector."""
+        sender = WebhookSender(webhook_url="https://example.com/webhook")
+
+        async def run_test():
+            first = await sender._get_session()
+            second = await sender._get_session()
+            limit_per_host = first.connector.limit_per_host
+            timeout = first.timeout
+            await sender.close()
+            return first is second, limit_per_host, timeout
+
+        same, limit_per_host, timeout = loop.run_until_complete(run_test())
+
+        assert same
+        assert limit_per_host == 4
+        assert timeout.total == 10
+        assert timeout.connect == 3
+
+
+class TestWebhookLocalServer:
+    """Sends through a real aiohttp session to an in-process server."""
+
+    def test_sends_share_one_keep_alive_connection(self, loop):
+        """Test that real sends deliver the payload and reuse the connection."""
+        received = []
+        peers = set()
+
+        async def handle(request):
+            received.append((await request.json(), request.headers["Authorization"]))
+            peers.add(request.transport.get_extra_info("peername"))
+            return web.Response()
+
+        async def run_test():
+            app = web.Application()
+            app.router.add_post("/webhook", handle)
+            async with TestServer(app) as server:
+                sender = WebhookSender(
+                    str(server.make_url("/webhook")),
+                    payload_urgent={"color": "red"},
+                    bearer_token="test-token",
+                )
+                try:
+                    return [await sender.send_notification("urgent") for _ in range(2)]
+                finally:
+                    await sender.close()
+
+        assert loop.run_until_complete(run_test()) == [True, True]
+        assert received == [({"color": "red"}, "Bearer test-token")] * 2
+        assert len(peers) == 1
+
+
+class TestWebhookSendQueue:
+    """Tests for the background webhook send queue."""
+
+    def test_worker_started_on_first_queued_send(self, loop):
+        """Test that the worker thread is only started once a send is queued."""
+        sender = WebhookSender("https://example.com/webhook")
+        assert sender._send_worker is None
+
+        with patch.object(sender, "_send_sync_request"):
+            sender._enqueue_send("message")
+            worker = sender._send_worker
+            sender._enqueue_send("urgent")
+            assert sender._send_worker is worker
+            assert worker.is_alive()
+            loop.run_until_complete(sender.close())
+
+    def test_sync_send_from_thread_is_queued(self):
+        """Test that sends from a background thread go through the queue."""
         sender = WebhookSender("https://example.com/webhook")
 
-        mock_response = AsyncMock()
-        mock_response.status = 200
-        mock_response.__aenter__ = AsyncMock(return_value=mock_response)
-        mock_response.__aexit__ = AsyncMock(return_value=None)
+        with patch.object(sender, "_enqueue_send") as mock_enqueue:
+            thread = threading.Thread(
+                target=sender.send_notification_sync, args=("urgent",)
+            )
+            thread.start()
+            thread.join()
 
-        mock_session = MagicMock()
-        mock_session.post = MagicMock(return_value=mock_response)
-        mock_session.closed = False
+        mock_enqueue.assert_called_once_with("urgent")
+
+    def test_sync_send_from_thread_uses_bound_loop(self, loop):
+        """Test that thread sends go to the bound event loop when running."""
+        sender = WebhookSender("https://example.com/webhook")
+
+        async def run_test():
+            sender.bind_loop(asyncio.get_running_loop())
+            with (
+                patch.object(
+                    sender, "send_notification", new_callable=AsyncMock
+                ) as mock_send,
+                patch.object(sender, "_enqueue_send") as mock_enqueue,
+            ):
+                thread = threading.Thread(
+                    target=sender.send_notification_sync, args=("message",)
+                )
+                thread.start()
+                thread.join()
+                for _ in range(3):
+                    await asyncio.sleep(0)
+            return mock_send, mock_enqueue
+
+        mock_send, mock_enqueue = loop.run_until_complete(run_test())
+
+        mock_send.assert_awaited_once_with("message")
+        mock_enqueue.assert_not_called()
+        assert not sender._send_tasks
+
+    def test_full_queue_drops_oldest(self):
+        """Test that a full queue drops the oldest pending send."""
+        sender = WebhookSender("https://example.com/webhook")
+        sender._send_queue = queue.Queue(maxsize=2)
+
+        # Without the worker, nothing takes sends off the queue
+        with patch.object(sender, "_start_send_worker"):
+            sender._enqueue_send("message")
+            sender._enqueue_send("urgent")
+            sender._enqueue_send("clear")
+
+        assert sender._send_queue.get_nowait() == "urgent"
+        assert sender._send_queue.get_nowait() == "clear"
+
+    def test_send_loop_skips_consecutive_duplicates(self, caplog):
+        """Test that queued duplicate sends are posted once per batch."""
+        sender = WebhookSender(None)
+        for notification_type in ("message", "message", "urgent", "clear", "clear"):
+            sender._send_queue.put(notification_type)
+        sender._send_queue.put(None)  # Stop the loop after the batch
+
+        with (
+            patch.object(sender, "_send_sync_request") as mock_send,
+            caplog.at_level(logging.DEBUG, logger="src.webhook.sender"),
+        ):
+            sender._send_loop()
+
+        assert [r.getMessage() for r in caplog.records] == [
+            "Collapsed repeated queued webhook send: message",
+            "Collapsed repeated queued webhook send: clear",
+        ]
+
+        assert [c.args[0] for c in mock_send.call_args_list] == [
+            "message",
+            "urgent",
+            "clear",
+        ]
+
+    def test_close_stops_worker_and_closes_sessions(self, loop):
+        """Test that close() drains and stops the worker and closes sessions."""
+        sender = WebhookSender("https://example.com/webhook")
 
-        # Test all three notification types
-        for notification_type in ["message", "urgent", "clear"]:
+        with (
+            patch.object(sender, "_send_sync_request") as mock_send,
+            patch.object(sender._requests_session, "close") as mock_close,
+        ):
+            sender._enqueue_send("urgent")
+            worker = sender._send_worker
+            loop.run_until_complete(sender.close())
+
+        assert not worker.is_alive()
+        assert sender._send_worker is None
+        mock_send.assert_called_once_with("urgent")
+        mock_close.assert_called_once()
+
+    def test_sync_request_uses_shared_session(self):
+        """Test that sync sends reuse the sender's requests session."""
+        sender = WebhookSender("https://example.com/webhook")
+
+        with patch.object(sender._requests_session, "post") as mock_post:
+            mock_post.side_effect = lambda *args, **kwargs: make_sync_response(200)
+            assert sender._send_sync_request("message") is True
+            assert sender._send_sync_request("urgent") is True
+
+        assert mock_post.call_count == 2
+        assert mock_post.call_args.args[0] == "https://example.com/webhook"
+
+    def test_sync_error_body_read_is_capped(self):
+        """Test that a sync send streams and reads only an error body snippet."""
+        sender = WebhookSender("https://example.com/webhook")
+        body = io.BytesIO(b"x" * (ERROR_BODY_SNIPPET_SIZE * 4))
+        response = make_sync_response(500, body)
 
-            async def run_test(ntype=notification_type):
-                with patch.object(sender, "_get_session", return_value=mock_session):
-                    return await sender.send_notification(ntype)
+        with patch.object(sender._requests_session, "post") as mock_post:
+            mock_post.return_value = response
+            assert sender._send_sync_request("message") is False
 
-            result = asyncio.get_event_loop().run_until_complete(run_test())
-            assert result is True, f"Failed for type: {notification_type}"
+        assert mock_post.call_args.kwargs["stream"] is True
+        # Bytes read from the connection
+        assert response.raw.tell() == ERROR_BODY_SNIPPET_SIZE